@@ -0,0 +1,174 @@
+import argparse
+import asyncio
+import importlib.util
+import os
+import sys
+
+from time import perf_counter
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+sys.path.insert(0, os.path.join(ROOT, 'openai'))
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+
+import openai
+
+from fake_openai_server import FakeOpenAIServer
+from utils import Logger, RestScheduler
+
+"""
+benchmark of openai bot conversation compaction against a local fake completion server.
+
+runs the same conversation through do_openai_chat three times:
+trim: history is only trimmed to the token budget.
+inline: the user waits for the summary after every reply over threshold.
+background: the summary is written by the compaction worker off the request path.
+
+reports turn latency, prompt tokens of chat requests and summary requests.
+tokens are estimated from characters so the benchmark runs offline, rate limits of
+the rest scheduler are lifted so latency is the one of completions.
+
+usage: python benchmarks/compaction_benchmark.py [--turns 40] [--latency 0.2]
+"""
+
+"""
+token counter estimating 4 characters per token.
+"""
+class ApproximateTokenCounter():
+    def count(self, message):
+        return 3 + sum(len(value) // 4 + 1 for value in message.values())
+
+    async def count_async(self, message):
+        return self.count(message)
+
+class FakeTyping():
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+class FakeChannel():
+    def __init__(self, channel_id):
+        self.id = channel_id
+        self.name = 'channel%d' % (channel_id)
+        self.sent = []
+
+    def typing(self):
+        return FakeTyping()
+
+    async def send(self, text):
+        self.sent.append(text)
+
+"""
+load OpenAI class without launching it.
+
+@return module
+"""
+def load_bot_module():
+    spec = importlib.util.spec_from_file_location('bot_openai', os.path.join(ROOT, 'openai', 'main.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module
+
+"""
+return percentile of values.
+
+@param values list[float]
+@param percent float
+@return float
+"""
+def percentile(values, percent):
+    values = sorted(values)
+
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+"""
+run conversation in a mode.
+
+@param module module of openai bot.
+@param server FakeOpenAIServer
+@param mode string trim, inline or background.
+@param args argparse.Namespace
+@return dict result.
+"""
+async def run_case(module, server, mode, args):
+    module.OpenAI.chat_streaming = False
+    module.OpenAI.history_token_budget = args.budget
+    module.OpenAI.compaction_threshold_tokens = args.threshold if mode != 'trim' else 10 ** 9
+
+    client = module.OpenAI('benchmark', Logger('ERROR'), launch=False)
+    counter = ApproximateTokenCounter()
+    client.token_counter = counter
+    client.compactor.token_counter = counter
+    channel = FakeChannel(len(server.requests) + 1)
+    first_request = len(server.requests)
+    latencies = []
+
+    for turn in range(args.turns):
+        started = perf_counter()
+        await client.do_openai_chat(None, channel, 'user', ' '.join('turn%d-word%d' % (turn, index) for index in range(args.message_words)))
+
+        if (mode == 'inline'):
+            await asyncio.gather(*client.compactor.tasks.values())
+
+        latencies.append(perf_counter() - started)
+
+    await asyncio.gather(*client.compactor.tasks.values())
+    client.compactor.stop()
+    client.rest.stop()
+
+    requests = server.requests[first_request:]
+    summaries = [body for body in requests if body['messages'][0]['content'] == module.Compactor.prompt]
+    chats = [body for body in requests if body['messages'][0]['content'] != module.Compactor.prompt]
+    prompt_tokens = [sum(counter.count(message) for message in body['messages']) + 3 for body in chats]
+    conversation = client.get_chat_history(None, channel)
+    oldest_turn = next((message['content'].split('-')[0] for message in chats[-1]['messages'] if message['role'] == 'user'), '-')
+
+    return {
+        'p50': percentile(latencies, 50),
+        'p99': percentile(latencies, 99),
+        'prompt_mean': sum(prompt_tokens) / len(prompt_tokens),
+        'prompt_max': max(prompt_tokens),
+        'summaries': len(summaries),
+        'oldest_turn': oldest_turn,
+        'summarized': conversation.summary is not None and any(message is conversation.summary for message in conversation.messages),
+    }
+
+"""
+run benchmark.
+
+@param args argparse.Namespace
+"""
+async def run(args):
+    server = FakeOpenAIServer(args.latency, args.reply_words, 0)
+    openai.api_base = await server.start(args.port)
+    module = load_bot_module()
+
+    for kind in list(RestScheduler.route_limits.keys()):
+        RestScheduler.route_limits[kind] = (10 ** 9, 1.0)
+
+    print('turns=%d latency=%.2f s budget=%d threshold=%d' % (args.turns, args.latency, args.budget, args.threshold))
+    print('%-12s %9s %9s %12s %12s %10s %12s %10s' % ('mode', 'p50 s', 'p99 s', 'prompt mean', 'prompt max', 'summaries', 'oldest turn', 'summary'))
+
+    for mode in ('trim', 'inline', 'background'):
+        result = await run_case(module, server, mode, args)
+        print('%-12s %9.2f %9.2f %12.0f %12d %10d %12s %10s' % (
+            mode, result['p50'], result['p99'], result['prompt_mean'], result['prompt_max'], result['summaries'], result['oldest_turn'], result['summarized'],
+        ))
+
+    await server.stop()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--turns', type=int, default=40)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--message-words', type=int, default=40)
+    parser.add_argument('--reply-words', type=int, default=80)
+    parser.add_argument('--budget', type=int, default=3000)
+    parser.add_argument('--threshold', type=int, default=2000)
+    parser.add_argument('--port', type=int, default=8767)
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
@@ -0,0 +1,73 @@
+import argparse
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+sys.path.insert(0, os.path.join(ROOT, 'openai'))
+
+from history import Conversation, ConversationStore
+from utils import Logger
+
+"""
+benchmark of memory used by openai bot chat histories as channels grow.
+
+appends turns to conversations of more and more channels, kept either in a plain
+dict like before or in the bounded conversation store, and reports resident memory
+and the approximate bytes tracked by the store.
+resident memory is read from /proc (linux).
+
+usage: python benchmarks/conversation_store_benchmark.py [--channels 20000] [--max-mib 32]
+"""
+
+"""
+return resident memory of this process.
+
+@return float MiB.
+"""
+def get_rss_mib():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+
+"""
+run channels through a store.
+
+@param store dict or ConversationStore
+@param args argparse.Namespace
+"""
+def run_case(store, args):
+    text = 'x' * args.message_bytes
+    step = max(1, args.channels // 5)
+
+    for channel_id in range(args.channels):
+        key = str(channel_id)
+        conversation = store.get(key) or Conversation()
+
+        for turn in range(args.turns):
+            conversation.append({'role': 'user', 'content': '%s %d' % (text, turn)}, 0)
+            conversation.append({'role': 'assistant', 'content': '%s %d' % (text, turn)}, 0)
+
+        if (isinstance(store, dict)):
+            store[key] = conversation
+        else:
+            store.put(key, conversation)
+
+        if ((channel_id + 1) % step == 0):
+            tracked = (store.bytes / 1024 / 1024) if isinstance(store, ConversationStore) else 0
+            print('  channels=%-8d conversations=%-8d rss=%.0f MiB tracked=%.1f MiB' % (channel_id + 1, len(store), get_rss_mib(), tracked))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--case', choices=('dict', 'store'), default='store')
+    parser.add_argument('--channels', type=int, default=20000)
+    parser.add_argument('--turns', type=int, default=10)
+    parser.add_argument('--message-bytes', type=int, default=400)
+    parser.add_argument('--max-mib', type=int, default=32)
+    args = parser.parse_args()
+
+    print('case=%s channels=%d turns=%d message_bytes=%d' % (args.case, args.channels, args.turns, args.message_bytes))
+
+    if (args.case == 'dict'):
+        run_case({}, args)
+    else:
+        run_case(ConversationStore(args.max_mib * 1024 * 1024, 6 * 60 * 60, Logger('ERROR')), args)
@@ -0,0 +1,152 @@
+import argparse
+import asyncio
+import json
+import time
+
+from aiohttp import web
+
+"""
+local fake of the openai chat completion endpoint.
+
+answers POST /v1/chat/completions after a fixed latency with a reply of a given
+number of words and records every request, so the openai bot can be run and
+measured without network. streamed requests get one server sent event per word
+at a fixed interval. point the bot at it with openai.api_base or
+OPENAI_API_BASE=http://127.0.0.1:<port>/v1.
+
+usage: python benchmarks/fake_openai_server.py [--port 8767] [--latency 0.5] [--token-interval 0.02]
+"""
+class FakeOpenAIServer():
+
+    """
+    constructor.
+
+    @param latency float seconds before the first word.
+    @param reply_words int words of a reply.
+    @param token_interval float seconds between streamed words.
+    """
+    def __init__(self, latency=0.5, reply_words=50, token_interval=0.02):
+        self.latency = latency
+        self.reply_words = reply_words
+        self.token_interval = token_interval
+        self.requests = []
+        self.runner = None
+
+    """
+    start listening.
+
+    @param port int
+    @param host string
+    @return string api base url.
+    """
+    async def start(self, port, host='127.0.0.1'):
+        app = web.Application()
+        app.router.add_post('/v1/chat/completions', self.handle_chat)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host, port).start()
+
+        return 'http://%s:%d/v1' % (host, port)
+
+    """
+    stop listening.
+    """
+    async def stop(self):
+        if (self.runner is not None):
+            await self.runner.cleanup()
+            self.runner = None
+
+    """
+    return reply text of request.
+
+    @param body dict request body.
+    @return string
+    """
+    def get_reply(self, body):
+        return ' '.join('word%d' % (index) for index in range(self.reply_words))
+
+    """
+    handle chat completion request.
+
+    @param request aiohttp.web.Request
+    @return aiohttp.web.Response
+    """
+    async def handle_chat(self, request):
+        body = await request.json()
+        self.requests.append(body)
+        await asyncio.sleep(self.latency)
+
+        if (body.get('stream')):
+            return await self.stream_chat(request, body)
+
+        # a reply is complete when its last word would have been streamed.
+        await asyncio.sleep(self.token_interval * max(0, self.reply_words - 1))
+
+        return web.json_response({
+            'id': 'chatcmpl-fake%d' % (len(self.requests)),
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': self.get_reply(body)}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+        })
+
+    """
+    stream chat completion as server sent events.
+
+    @param request aiohttp.web.Request
+    @param body dict request body.
+    @return aiohttp.web.StreamResponse
+    """
+    async def stream_chat(self, request, body):
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream'})
+        await response.prepare(request)
+
+        words = self.get_reply(body).split(' ')
+        deltas = [{'role': 'assistant'}] + [{'content': word + (' ' if index < len(words) - 1 else '')} for index, word in enumerate(words)]
+
+        for index, delta in enumerate(deltas):
+            if (index > 1):
+                await asyncio.sleep(self.token_interval)
+
+            chunk = {
+                'id': 'chatcmpl-fake%d' % (len(self.requests)),
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': body.get('model'),
+                'choices': [{'index': 0, 'delta': delta, 'finish_reason': None}],
+            }
+            await response.write(('data: %s\n\n' % (json.dumps(chunk))).encode())
+
+        await response.write(b'data: [DONE]\n\n')
+        await response.write_eof()
+
+        return response
+
+"""
+run server until interrupted.
+
+@param args argparse.Namespace
+"""
+async def run(args):
+    server = FakeOpenAIServer(args.latency, args.reply_words, args.token_interval)
+    print('listening on %s' % (await server.start(args.port)))
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+        print(json.dumps({'requests': len(server.requests)}))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8767)
+    parser.add_argument('--latency', type=float, default=0.5)
+    parser.add_argument('--reply-words', type=int, default=50)
+    parser.add_argument('--token-interval', type=float, default=0.02)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from aiohttp import ClientSession
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sleepiness-inc'))
+
+from utils import Logger, Metrics
+
+"""
+benchmark of metrics recording overhead.
+
+measures the cost of a histogram observation with two perf_counter reads, as
+recorded around on_message, and of a labeled counter increment, then serves the
+registry and measures one scrape of the endpoint.
+
+usage: python benchmarks/metrics_benchmark.py [--count 1000000]
+"""
+
+"""
+return nanoseconds per call of function.
+
+@param function callable
+@param count int
+@return float
+"""
+def measure(function, count):
+    started = time.perf_counter()
+    for _ in range(count):
+        function()
+
+    return (time.perf_counter() - started) * 1000000000 / count
+
+"""
+run benchmark.
+
+@param args argparse.Namespace
+"""
+async def run(args):
+    metrics = Metrics('benchmark', Logger('ERROR'))
+    histogram = metrics.histogram('on_message_seconds', 'handling time of a received message.')
+    counter = metrics.counter('messages_sent_total', 'sent messages.', ('priority',))
+    perf_counter = time.perf_counter
+
+    def empty():
+        pass
+
+    def timed():
+        started = perf_counter()
+        histogram.observe(perf_counter() - started)
+
+    def increment():
+        counter.inc(1, (1,))
+
+    baseline = measure(empty, args.count)
+
+    print('empty call:          %.0f ns' % (baseline))
+    print('timed observation:   %.0f ns' % (measure(timed, args.count) - baseline))
+    print('counter increment:   %.0f ns' % (measure(increment, args.count) - baseline))
+
+    await metrics.start(args.port)
+
+    async with ClientSession() as session:
+        started = time.perf_counter()
+        async with session.get('http://127.0.0.1:%d/metrics' % (args.port)) as response:
+            body = await response.text()
+        scrape_seconds = time.perf_counter() - started
+
+    await metrics.stop()
+
+    print('scrape:              %.2f ms (%d bytes)' % (scrape_seconds * 1000, len(body)))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=1000000)
+    parser.add_argument('--port', type=int, default=8766)
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
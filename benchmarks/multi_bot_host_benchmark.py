@@ -0,0 +1,105 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+sys.path.insert(0, os.path.join(ROOT, 'host'))
+
+from host import BOTS, SharedConnector, create_bot
+
+"""
+benchmark of the multi bot host against one process per bot.
+
+starts python bots either as separate processes or all in one host process,
+and reports resident memory and startup time until every client is constructed
+(interpreter start, imports and client setup, network excluded).
+resident memory is read from /proc (linux).
+
+usage: python benchmarks/multi_bot_host_benchmark.py [--bots sleepiness-inc,god-illustorator-gmk,openai]
+"""
+
+"""
+return resident memory of this process.
+
+@return int bytes.
+"""
+def get_rss():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+"""
+construct bots in this process.
+
+@param names list[string] bot names.
+@param shared bool share one connector between bots like the host.
+@return dict result.
+"""
+async def run_case(names, shared):
+    connector = SharedConnector() if shared else None
+    env = dict(os.environ, TOKEN='benchmark', LOG_LEVEL='ERROR')
+    clients = [create_bot(name, env, connector) for name in names]
+    rss = get_rss()
+
+    for client in clients:
+        await client.close()
+
+    if (connector is not None):
+        await connector.release()
+
+    return {'rss_mib': rss / 1024 / 1024}
+
+"""
+run case in a fresh process.
+
+@param case string case argument.
+@param state_directory string directory of state databases.
+@return tuple(float seconds, dict result)
+"""
+def spawn(case, state_directory):
+    env = dict(os.environ, STATE_DB_PATH=os.path.join(state_directory, '%s.sqlite3' % (case.replace(',', '_'))))
+
+    started = time.perf_counter()
+    output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--case', case], env=env)
+    seconds = time.perf_counter() - started
+
+    return seconds, json.loads(output.decode().strip().splitlines()[-1])
+
+"""
+run all cases and print results.
+
+@param args argparse.Namespace
+"""
+def run_all(args):
+    names = args.bots.split(',')
+
+    with tempfile.TemporaryDirectory() as directory:
+        separate = [spawn('separate:%s' % (name), directory) for name in names]
+        host_seconds, host = spawn('host:%s' % (','.join(names)), directory)
+
+    print('bots: %s' % (', '.join(names)))
+    print('%-28s %12s %10s' % ('case', 'startup s', 'rss MiB'))
+
+    for name, (seconds, result) in zip(names, separate):
+        print('%-28s %12.2f %10.1f' % ('process ' + name, seconds, result['rss_mib']))
+
+    print('%-28s %12.2f %10.1f' % ('separate total', sum(seconds for seconds, result in separate), sum(result['rss_mib'] for seconds, result in separate)))
+    print('%-28s %12.2f %10.1f' % ('separate slowest', max(seconds for seconds, result in separate), max(result['rss_mib'] for seconds, result in separate)))
+    print('%-28s %12.2f %10.1f' % ('host', host_seconds, host['rss_mib']))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--bots', default=','.join(BOTS.keys()))
+    parser.add_argument('--case', default=None)
+    args = parser.parse_args()
+
+    if (args.case is None):
+        run_all(args)
+    else:
+        mode, names = args.case.split(':')
+        print(json.dumps(asyncio.run(run_case(names.split(','), mode == 'host'))))
@@ -0,0 +1,156 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from aiohttp import ClientSession, web
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sleepiness-inc'))
+
+from utils import Logger, RestScheduler, TokenBucket, PRIORITY_DISCONNECT, PRIORITY_NOTIFY
+
+"""
+benchmark of RestScheduler against a local stand-in of the discord rest api.
+
+the stand-in server enforces per route rate limits and answers 429 with retry_after
+like discord does. a disconnect wave (member edits) and a notification burst are
+submitted at the same time, and the completion order, 429 count and queue wait
+time per priority are reported.
+
+usage: python benchmarks/rest_scheduler_benchmark.py [--members 60] [--notifications 20] [--time-scale 0.1]
+"""
+
+"""
+server side exception raised on 429.
+"""
+class RateLimited(Exception):
+    def __init__(self, retry_after):
+        super().__init__('429 Too Many Requests')
+        self.status = 429
+        self.retry_after = retry_after
+
+"""
+return stand-in discord rest api application.
+
+@param limits dict{string: tuple(int, float)} rate limit per route kind.
+@param stats dict counters.
+@return aiohttp.web.Application
+"""
+def create_app(limits, stats):
+    buckets = {}
+
+    def check(route):
+        if (buckets.get(route) is None):
+            buckets[route] = TokenBucket(*limits[route.split(':', 1)[0]])
+
+        bucket = buckets[route]
+        delay = bucket.get_delay()
+
+        if (delay > 0):
+            stats['429'] += 1
+            return web.json_response({'message': 'You are being rate limited.', 'retry_after': delay}, status=429)
+
+        bucket.consume()
+        stats['ok'] += 1
+        return None
+
+    async def send_message(request):
+        response = check('channel.send:%s' % (request.match_info['channel_id']))
+
+        return response if response is not None else web.json_response({'id': '1'})
+
+    async def edit_member(request):
+        response = check('member.edit:%s' % (request.match_info['guild_id']))
+
+        return response if response is not None else web.json_response({})
+
+    app = web.Application()
+    app.router.add_post('/channels/{channel_id}/messages', send_message)
+    app.router.add_patch('/guilds/{guild_id}/members/{member_id}', edit_member)
+
+    return app
+
+"""
+request stand-in server.
+
+@return coroutine function.
+"""
+def request(session, method, url, finished, label):
+    async def call():
+        async with session.request(method, url, json={}) as response:
+            if (response.status == 429):
+                raise RateLimited((await response.json())['retry_after'])
+
+        finished.append((label, time.perf_counter()))
+
+    return call
+
+"""
+run benchmark.
+
+@param args argparse.Namespace
+"""
+async def run(args):
+    limits = {kind: (capacity, period * args.time_scale) for kind, (capacity, period) in RestScheduler.route_limits.items()}
+    RestScheduler.route_limits = limits
+    RestScheduler.backoff_seconds = RestScheduler.backoff_seconds * args.time_scale
+
+    stats = {'ok': 0, '429': 0}
+    runner = web.AppRunner(create_app(limits, stats))
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', args.port)
+    await site.start()
+
+    base = 'http://127.0.0.1:%d' % (args.port)
+    scheduler = RestScheduler(args.concurrency, Logger('ERROR'))
+    finished = []
+
+    async with ClientSession() as session:
+        jobs = []
+
+        for index in range(args.notifications):
+            jobs.append(scheduler.submit(PRIORITY_NOTIFY, 'channel.send:1', request(session, 'POST', base + '/channels/1/messages', finished, 'notify')))
+
+        for member_id in range(args.members):
+            jobs.append(scheduler.submit(PRIORITY_DISCONNECT, 'member.edit:1', request(session, 'PATCH', base + '/guilds/1/members/%d' % (member_id), finished, 'disconnect')))
+
+        started = time.perf_counter()
+        max_depth = 0
+
+        gathered = asyncio.gather(*jobs, return_exceptions=True)
+        while (not gathered.done()):
+            max_depth = max(max_depth, scheduler.get_queue_depth())
+            await asyncio.sleep(0.01)
+
+        results = await gathered
+        elapsed = time.perf_counter() - started
+
+    scheduler.stop()
+    await runner.cleanup()
+
+    last_disconnect = max(at for label, at in finished if label == 'disconnect') - started
+    first_notify = min(at for label, at in finished if label == 'notify') - started
+
+    print('requests:           %d disconnects, %d notifications' % (args.members, args.notifications))
+    print('elapsed:            %.2f s' % (elapsed))
+    print('errors:             %d' % (len([result for result in results if isinstance(result, Exception)])))
+    print('server ok / 429:    %d / %d' % (stats['ok'], stats['429']))
+    print('scheduler metrics:  %s' % ({key: value for key, value in scheduler.metrics.items() if key != 'wait_seconds_per_priority'}))
+    print('max queue depth:    %d' % (max_depth))
+    print('last disconnect:    %.2f s' % (last_disconnect))
+    print('first notification: %.2f s' % (first_notify))
+
+    for priority, wait in sorted(scheduler.metrics['wait_seconds_per_priority'].items()):
+        print('wait priority %d:    count=%d avg=%.3f s max=%.3f s' % (priority, wait['count'], wait['sum'] / wait['count'], wait['max']))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--members', type=int, default=60)
+    parser.add_argument('--notifications', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--time-scale', type=float, default=0.1)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
@@ -0,0 +1,200 @@
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import time
+
+"""
+benchmark of runtime profiles (full, minimal) of SleepinessInc and OpenAI.
+
+feeds synthetic gateway payloads of large guilds to the discord.py connection state
+created with the client options of each profile, and reports resident memory growth and
+the cpu time until on_ready would be dispatched (guild creates and member chunks, network
+excluded). every case runs in a fresh process. resident memory is read from /proc (linux).
+
+usage: python benchmarks/runtime_profile_benchmark.py [--guilds 20] [--members 10000] [--voice-members 50]
+"""
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+BOTS = {
+    'sleepiness-inc': ('sleepiness-inc', 'sleepiness-inc.py', 'SleepinessInc'),
+    'openai': ('openai', 'main.py', 'OpenAI'),
+}
+
+PROFILES = ['full', 'minimal']
+
+CHUNK_SIZE = 1000
+
+SELF_ID = 1
+
+"""
+return resident memory of this process.
+
+@return int bytes.
+"""
+def get_rss():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+"""
+load bot class without launching it.
+
+@param bot string bot name.
+@return class
+"""
+def load_bot_class(bot):
+    directory, filename, class_name = BOTS[bot]
+    sys.path.insert(0, os.path.join(ROOT, directory))
+
+    spec = importlib.util.spec_from_file_location('bot_%s' % (bot.replace('-', '_')), os.path.join(ROOT, directory, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return getattr(module, class_name)
+
+"""
+return synthetic user payload.
+"""
+def user_payload(user_id):
+    return {'id': str(user_id), 'username': 'user%d' % (user_id), 'discriminator': '0001', 'avatar': None}
+
+"""
+return synthetic member payload.
+"""
+def member_payload(user_id):
+    return {'user': user_payload(user_id), 'roles': [], 'joined_at': '2021-01-01T00:00:00+00:00', 'nick': None, 'deaf': False, 'mute': False}
+
+"""
+return synthetic guild create payload, members contains only the bot and voice members like the gateway does for large guilds.
+"""
+def guild_payload(guild_id, members, voice_members):
+    base = guild_id * 1000000
+    text_channel = {'id': str(base + 1), 'type': 0, 'name': 'bed-room', 'position': 0, 'permission_overwrites': []}
+    voice_channel = {'id': str(base + 2), 'type': 2, 'name': 'voice', 'position': 1, 'permission_overwrites': [], 'bitrate': 64000, 'user_limit': 0}
+    voice_member_ids = [base + 10 + index for index in range(voice_members)]
+
+    return {
+        'id': str(guild_id),
+        'name': 'guild%d' % (guild_id),
+        'large': True,
+        'member_count': members,
+        'roles': [{'id': str(guild_id), 'name': '@everyone', 'permissions': '0', 'position': 0, 'color': 0, 'hoist': False, 'managed': False, 'mentionable': False}],
+        'emojis': [],
+        'channels': [text_channel, voice_channel],
+        'members': [member_payload(SELF_ID)] + [member_payload(member_id) for member_id in voice_member_ids],
+        'voice_states': [
+            {'user_id': str(member_id), 'channel_id': voice_channel['id'], 'session_id': 's', 'deaf': False, 'mute': False, 'self_deaf': False, 'self_mute': False, 'self_video': False, 'suppress': False}
+            for member_id in voice_member_ids
+        ],
+    }
+
+"""
+return synthetic guild members chunk payloads.
+"""
+def chunk_payloads(guild_id, members, nonce):
+    base = guild_id * 1000000
+    member_ids = [base + 10 + index for index in range(members)]
+    chunk_count = (len(member_ids) + CHUNK_SIZE - 1) // CHUNK_SIZE
+
+    for chunk_index in range(chunk_count):
+        yield {
+            'guild_id': str(guild_id),
+            'members': [member_payload(member_id) for member_id in member_ids[chunk_index * CHUNK_SIZE:(chunk_index + 1) * CHUNK_SIZE]],
+            'chunk_index': chunk_index,
+            'chunk_count': chunk_count,
+            'nonce': nonce,
+        }
+
+"""
+run one case in this process.
+
+@param bot string bot name.
+@param profile string runtime profile.
+@param args argparse.Namespace
+@return dict result.
+"""
+async def run_case(bot, profile, args):
+    from discord import Client
+    from discord.state import ChunkRequest
+
+    options = load_bot_class(bot).get_client_options(profile)
+
+    rss = get_rss()
+    client = Client(**options)
+    state = client._connection
+
+    started = time.perf_counter()
+    state.parse_ready({'user': dict(user_payload(SELF_ID), bot=True), 'guilds': [], 'session_id': 's'})
+    state._ready_task.cancel()
+    ready_seconds = time.perf_counter() - started
+
+    for guild_id in range(2, args.guilds + 2):
+        payload = guild_payload(guild_id, args.members, args.voice_members)
+
+        started = time.perf_counter()
+        guild = state._add_guild_from_data(payload)
+        ready_seconds += time.perf_counter() - started
+
+        if (not state._guild_needs_chunking(guild)):
+            continue
+
+        request = ChunkRequest(guild.id, state.loop, state._get_guild, cache=True)
+        state._chunk_requests[request.nonce] = request
+        chunks = list(chunk_payloads(guild_id, args.members, request.nonce))
+
+        started = time.perf_counter()
+        for chunk in chunks:
+            state.parse_guild_members_chunk(chunk)
+        ready_seconds += time.perf_counter() - started
+
+    return {
+        'bot': bot,
+        'profile': profile,
+        'ready_ms': ready_seconds * 1000,
+        'cached_members': sum(len(guild.members) for guild in state.guilds),
+        'rss_growth_mib': (get_rss() - rss) / 1024 / 1024,
+        'rss_mib': get_rss() / 1024 / 1024,
+    }
+
+"""
+run all cases in fresh processes and print results.
+
+@param args argparse.Namespace
+"""
+def run_all(args):
+    print('guilds=%d members=%d voice_members=%d' % (args.guilds, args.members, args.voice_members))
+    print('%-16s %-8s %10s %14s %16s %10s' % ('bot', 'profile', 'ready ms', 'cached members', 'rss growth MiB', 'rss MiB'))
+
+    for bot in BOTS.keys():
+        for profile in PROFILES:
+            output = subprocess.check_output([
+                sys.executable, os.path.abspath(__file__),
+                '--case', '%s:%s' % (bot, profile),
+                '--guilds', str(args.guilds),
+                '--members', str(args.members),
+                '--voice-members', str(args.voice_members),
+            ])
+            result = json.loads(output.decode().strip().splitlines()[-1])
+
+            print('%-16s %-8s %10.1f %14d %16.1f %10.1f' % (
+                result['bot'], result['profile'], result['ready_ms'], result['cached_members'],
+                result['rss_growth_mib'], result['rss_mib'],
+            ))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--guilds', type=int, default=20)
+    parser.add_argument('--members', type=int, default=10000)
+    parser.add_argument('--voice-members', type=int, default=50)
+    parser.add_argument('--case', default=None)
+    args = parser.parse_args()
+
+    if (args.case is None):
+        run_all(args)
+    else:
+        bot, profile = args.case.split(':')
+        print(json.dumps(asyncio.run(run_case(bot, profile, args))))
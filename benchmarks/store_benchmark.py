@@ -0,0 +1,60 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sleepiness-inc'))
+
+from store import Store
+from utils import Logger
+
+"""
+benchmark of SleepinessInc state store.
+
+measures put latency seen by callers, background flush time and bulk load time
+for a number of guilds.
+
+usage: python benchmarks/store_benchmark.py [--guilds 5000]
+"""
+
+EXECUTION_TIME_LIST = ['00:00', '00:30', '01:00', '01:30', '02:00', '02:30', '03:00', '03:30', '04:00', '05:00', '06:00']
+
+"""
+run benchmark.
+
+@param guilds int number of guilds.
+@param path string sqlite database file path.
+"""
+def run(guilds, path):
+    logger = Logger('ERROR')
+    store = Store(path, logger)
+
+    started = time.perf_counter()
+    for guild_id in range(guilds):
+        store.put(guild_id, 'execution', EXECUTION_TIME_LIST)
+        store.put(guild_id, 'exclude', ['Saturday 01:00', 'Sunday 01:00'])
+        store.put(guild_id, 'sleeping', '2023-01-01T01:00:00+09:00' if guild_id % 10 == 0 else None)
+    put_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    store.close()
+    flush_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    state = Store(path, logger).load_all()
+    load_seconds = time.perf_counter() - started
+
+    print('guilds:            %d' % (guilds))
+    print('put total:         %.2f ms (%.2f us/put)' % (put_seconds * 1000, put_seconds * 1000000 / (guilds * 3)))
+    print('close with flush:  %.2f ms' % (flush_seconds * 1000))
+    print('bulk load:         %.2f ms (%d guilds)' % (load_seconds * 1000, len(state)))
+    print('database size:     %.1f KiB' % (os.path.getsize(path) / 1024))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--guilds', type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        run(args.guilds, os.path.join(directory, 'state.sqlite3'))
@@ -0,0 +1,141 @@
+import argparse
+import asyncio
+import importlib.util
+import os
+import sys
+
+from time import perf_counter
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+sys.path.insert(0, os.path.join(ROOT, 'openai'))
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+
+import openai
+
+from compaction_benchmark import ApproximateTokenCounter
+from fake_openai_server import FakeOpenAIServer
+from utils import Logger
+
+"""
+benchmark of streamed openai chat replies against a local fake completion server.
+
+sends one chat message with streaming off and on, for a short reply and for a reply
+over the discord message length limit, and reports seconds until the first text is
+visible, seconds until the reply is complete, posted messages, edits and the longest
+message, which discord rejects over 2000 characters.
+discord calls go through the rest scheduler with its real rate limits.
+
+usage: python benchmarks/streaming_benchmark.py [--latency 0.5] [--token-interval 0.02]
+"""
+
+class FakeTyping():
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+class FakeMessage():
+    def __init__(self, channel, content):
+        self.channel = channel
+        self.content = content
+
+    async def edit(self, content=None):
+        self.channel.edits += 1
+        self.content = content
+
+class FakeChannel():
+    def __init__(self, channel_id):
+        self.id = channel_id
+        self.name = 'channel%d' % (channel_id)
+        self.messages = []
+        self.edits = 0
+        self.first_visible_at = None
+
+    def typing(self):
+        return FakeTyping()
+
+    async def send(self, text):
+        if (self.first_visible_at is None):
+            self.first_visible_at = perf_counter()
+
+        self.messages.append(FakeMessage(self, text))
+
+        return self.messages[-1]
+
+"""
+load OpenAI class without launching it.
+
+@return module
+"""
+def load_bot_module():
+    spec = importlib.util.spec_from_file_location('bot_openai', os.path.join(ROOT, 'openai', 'main.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module
+
+"""
+send one chat message.
+
+@param module module of openai bot.
+@param streaming bool
+@param channel_id int
+@return dict result.
+"""
+async def run_case(module, streaming, channel_id):
+    module.OpenAI.chat_streaming = streaming
+    client = module.OpenAI('benchmark', Logger('ERROR'), launch=False)
+    client.token_counter = ApproximateTokenCounter()
+    channel = FakeChannel(channel_id)
+
+    started = perf_counter()
+    await client.do_openai_chat(None, channel, 'user', 'hello')
+    seconds = perf_counter() - started
+
+    client.rest.stop()
+
+    return {
+        'first_visible': (channel.first_visible_at - started) if channel.first_visible_at is not None else float('nan'),
+        'complete': seconds,
+        'messages': len(channel.messages),
+        'edits': channel.edits,
+        'characters': sum(len(message.content) for message in channel.messages),
+        'longest': max(len(message.content) for message in channel.messages),
+    }
+
+"""
+run benchmark.
+
+@param args argparse.Namespace
+"""
+async def run(args):
+    server = FakeOpenAIServer(args.latency, 0, args.token_interval)
+    openai.api_base = await server.start(args.port)
+    module = load_bot_module()
+
+    print('latency=%.2f s token_interval=%.3f s edit_interval=%.2f s' % (args.latency, args.token_interval, module.OpenAI.stream_edit_interval_seconds))
+    print('%-8s %-8s %14s %12s %10s %7s %12s %9s' % ('words', 'stream', 'first visible', 'complete', 'messages', 'edits', 'characters', 'longest'))
+
+    channel_id = 1
+    for words in (args.short_words, args.long_words):
+        server.reply_words = words
+
+        for streaming in (False, True):
+            result = await run_case(module, streaming, channel_id)
+            channel_id += 1
+            print('%-8d %-8s %12.2f s %10.2f s %10d %7d %12d %9d' % (words, streaming, result['first_visible'], result['complete'], result['messages'], result['edits'], result['characters'], result['longest']))
+
+    await server.stop()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=0.5)
+    parser.add_argument('--token-interval', type=float, default=0.02)
+    parser.add_argument('--short-words', type=int, default=60)
+    parser.add_argument('--long-words', type=int, default=500)
+    parser.add_argument('--port', type=int, default=8768)
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
@@ -0,0 +1,176 @@
+import argparse
+import asyncio
+import importlib.util
+import os
+import sys
+
+from time import perf_counter
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+sys.path.insert(0, os.path.join(ROOT, 'openai'))
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+
+import openai
+
+from compaction_benchmark import ApproximateTokenCounter, FakeChannel
+from fake_openai_server import FakeOpenAIServer
+from utils import Logger, RestScheduler
+
+"""
+benchmark of openai bot chat requests under bursts of messages.
+
+every channel gets bursts of messages a short gap apart, handled either
+directly, one request per message started at once like before, or through the
+per conversation turn queue. reports chat requests, time until the last reply,
+requests whose history was not in order, i.e. a later burst seen before the reply
+to an earlier one, and overlapping requests, i.e. sending again a message whose
+reply is still awaited by another request.
+rate limits of the rest scheduler are lifted so latency is the one of completions.
+
+usage: python benchmarks/turn_queue_benchmark.py [--channels 20] [--bursts 5] [--burst-size 4] [--gap 0.05]
+"""
+
+"""
+load OpenAI class without launching it.
+
+@return module
+"""
+def load_bot_module():
+    spec = importlib.util.spec_from_file_location('bot_openai', os.path.join(ROOT, 'openai', 'main.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module
+
+"""
+return whether chat request history is in order.
+
+messages of a later burst must come after the reply to the earlier burst.
+
+@param messages list[dict{string: string}]
+@return bool
+"""
+def is_ordered(messages):
+    burst = -1
+    answered = True
+
+    for message in messages:
+        if (message['role'] == 'assistant'):
+            answered = True
+            continue
+
+        current = int(message['content'].split('-')[0][len('burst'):])
+
+        if (current < burst or (current > burst and not answered)):
+            return False
+
+        burst = current
+        answered = False
+
+    return True
+
+"""
+return number of requests resending an unanswered message of an earlier request.
+
+@param requests list[dict] request bodies in arrival order.
+@return int
+"""
+def count_overlapping(requests):
+    sent = set()
+    overlapping = 0
+
+    for body in requests:
+        messages = body['messages']
+        answered = max([index for index, message in enumerate(messages) if message['role'] == 'assistant'], default=-1)
+        unanswered = [message['content'] for message in messages[answered + 1:] if message['role'] == 'user']
+
+        if (any(content in sent for content in unanswered)):
+            overlapping += 1
+
+        sent.update(unanswered)
+
+    return overlapping
+
+"""
+send bursts to channels in a mode.
+
+@param module module of openai bot.
+@param server FakeOpenAIServer
+@param mode string direct or queue.
+@param args argparse.Namespace
+@return dict result.
+"""
+async def run_case(module, server, mode, args):
+    module.OpenAI.chat_streaming = False
+    client = module.OpenAI('benchmark', Logger('ERROR'), launch=False)
+    client.token_counter = ApproximateTokenCounter()
+    client.compactor.token_counter = client.token_counter
+    channels = [FakeChannel(channel_id) for channel_id in range(1, args.channels + 1)]
+    first_request = len(server.requests)
+
+    async def send(channel, burst, index):
+        message = {'role': 'user', 'content': 'burst%d-message%d-channel%d' % (burst, index, channel.id)}
+        await asyncio.sleep(args.gap * index)
+
+        if (mode == 'direct'):
+            await client.run_chat_turn(client.get_chat_history_key(None, channel), [(None, channel, message)])
+        else:
+            await client.do_openai_chat(None, channel, message['role'], message['content'])
+
+    async def run_channel(channel):
+        for burst in range(args.bursts):
+            await asyncio.gather(*[send(channel, burst, index) for index in range(args.burst_size)])
+
+    started = perf_counter()
+    await asyncio.gather(*[run_channel(channel) for channel in channels])
+    seconds = perf_counter() - started
+
+    client.compactor.stop()
+    client.chat_turns.stop()
+    client.rest.stop()
+
+    requests = server.requests[first_request:]
+
+    return {
+        'messages': args.channels * args.bursts * args.burst_size,
+        'requests': len(requests),
+        'seconds': seconds,
+        'unordered': sum(1 for body in requests if not is_ordered(body['messages'])),
+        'overlapping': count_overlapping(requests),
+    }
+
+"""
+run benchmark.
+
+@param args argparse.Namespace
+"""
+async def run(args):
+    server = FakeOpenAIServer(args.latency, args.reply_words, 0)
+    openai.api_base = await server.start(args.port)
+    module = load_bot_module()
+
+    for kind in list(RestScheduler.route_limits.keys()):
+        RestScheduler.route_limits[kind] = (10 ** 9, 1.0)
+
+    print('channels=%d bursts=%d burst_size=%d gap=%.2f s latency=%.2f s' % (args.channels, args.bursts, args.burst_size, args.gap, args.latency))
+    print('%-8s %10s %10s %10s %10s %12s' % ('mode', 'messages', 'requests', 'seconds', 'unordered', 'overlapping'))
+
+    for mode in ('direct', 'queue'):
+        result = await run_case(module, server, mode, args)
+        print('%-8s %10d %10d %10.2f %10d %12d' % (mode, result['messages'], result['requests'], result['seconds'], result['unordered'], result['overlapping']))
+
+    await server.stop()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--channels', type=int, default=20)
+    parser.add_argument('--bursts', type=int, default=5)
+    parser.add_argument('--burst-size', type=int, default=4)
+    parser.add_argument('--gap', type=float, default=0.05)
+    parser.add_argument('--latency', type=float, default=0.3)
+    parser.add_argument('--reply-words', type=int, default=20)
+    parser.add_argument('--port', type=int, default=8769)
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
@@ -0,0 +1,299 @@
+import argparse
+import asyncio
+import gc
+import importlib.util
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from datetime import datetime, timedelta
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+sys.path.insert(0, os.path.join(ROOT, 'sleepiness-inc'))
+os.environ.setdefault('TZ', 'UTC')
+
+from utils import Logger, DateTime, RestScheduler, TZ
+from pytz import timezone
+
+"""
+benchmark of the SleepinessInc watch tick at synthetic scale.
+
+builds fake guilds, voice channels and members, and runs scheduler ticks under a
+virtual clock: the clock jumps to the next scheduled fire time, due events are
+popped from the scheduler and passed to watch, and members join again between ticks.
+discord rest calls are answered in process and counted, rate limits of the rest
+scheduler are lifted so the numbers show the cost of the bot itself.
+
+reports tick latency, per guild completion latency from tick start, rest call
+counts per route and allocations of one tick traced by tracemalloc.
+
+usage: python benchmarks/watch_tick_benchmark.py [--guilds 1000] [--voice-channels 50] [--members 25] [--ticks 3]
+"""
+
+"""
+count of rest calls per route kind.
+"""
+REST_CALLS = {}
+
+"""
+load SleepinessInc class without launching it.
+
+@return module
+"""
+def load_bot_module():
+    spec = importlib.util.spec_from_file_location('bot_sleepiness_inc', os.path.join(ROOT, 'sleepiness-inc', 'sleepiness-inc.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module
+
+"""
+count rest call.
+
+@param kind string route kind.
+"""
+def count_rest_call(kind):
+    REST_CALLS[kind] = REST_CALLS.get(kind, 0) + 1
+
+"""
+virtual clock replacing utils.DateTime in the bot module.
+"""
+class VirtualClock(DateTime):
+    current = None
+
+    @classmethod
+    def now(cls, zone_name=None):
+        return cls.current.astimezone(cls.get_zone(zone_name))
+
+class FakeVoiceState():
+    __slots__ = ('channel',)
+
+    def __init__(self, channel):
+        self.channel = channel
+
+class FakeMember():
+    __slots__ = ('id', 'name', 'nick', 'bot', 'guild', 'channel', 'client')
+
+    def __init__(self, member_id, guild, channel, client):
+        self.id = member_id
+        self.name = 'member%d' % (member_id)
+        self.nick = None
+        self.bot = False
+        self.guild = guild
+        self.channel = channel
+        self.client = client
+
+    async def edit(self, voice_channel=None):
+        count_rest_call('member.edit')
+
+        # leave voice channel and dispatch voice state update like the gateway does.
+        if (self.channel.voice_states.pop(self.id, None) is not None):
+            await self.client.on_voice_state_update(self, FakeVoiceState(self.channel), FakeVoiceState(None))
+
+class FakeTextChannel():
+    def __init__(self, channel_id, name, guild):
+        self.id = channel_id
+        self.name = name
+        self.guild = guild
+
+    async def send(self, text):
+        count_rest_call('channel.send')
+
+class FakeVoiceChannel():
+    def __init__(self, channel_id, name, guild):
+        self.id = channel_id
+        self.name = name
+        self.guild = guild
+        self.voice_states = {}
+
+class FakeGuild():
+    def __init__(self, guild_id, voice_channels, members, cached_ratio, client):
+        base = guild_id * 1000000
+        self.id = guild_id
+        self.name = 'guild%d' % (guild_id)
+        self.shard_id = 0
+        self.text_channels = [FakeTextChannel(base + 1, client.notify_channel_name, self)]
+        self.voice_channels = [FakeVoiceChannel(base + 10 + index, 'voice%d' % (index), self) for index in range(voice_channels)]
+        self.channels = self.text_channels + self.voice_channels
+        self.channels_by_id = {channel.id: channel for channel in self.channels}
+        self.members_per_channel = {
+            channel.id: [FakeMember(base + 1000 + index * members + number, self, channel, client) for number in range(members)]
+            for index, channel in enumerate(self.voice_channels)
+        }
+        self.all_members = {member.id: member for members in self.members_per_channel.values() for member in members}
+        cached_count = int(len(self.all_members) * cached_ratio)
+        self.cached_members = {member_id: member for member_id, member in list(self.all_members.items())[:cached_count]}
+
+    def join_all(self):
+        for channel in self.voice_channels:
+            channel.voice_states = {member.id: True for member in self.members_per_channel[channel.id]}
+
+    def get_channel(self, channel_id):
+        return self.channels_by_id.get(channel_id)
+
+    def get_member(self, member_id):
+        return self.cached_members.get(member_id)
+
+    async def fetch_member(self, member_id):
+        count_rest_call('member.fetch')
+
+        return self.all_members[member_id]
+
+"""
+return percentile of sorted values.
+
+@param values list[float] sorted.
+@param percent float
+@return float
+"""
+def percentile(values, percent):
+    if (len(values) == 0):
+        return 0.0
+
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+"""
+format latency summary.
+
+@param values list[float] seconds.
+@return string
+"""
+def summarize(values):
+    values = sorted(values)
+
+    return 'n=%d p50=%.1f ms p90=%.1f ms p99=%.1f ms max=%.1f ms' % (
+        len(values), percentile(values, 50) * 1000, percentile(values, 90) * 1000, percentile(values, 99) * 1000, (values[-1] if values else 0) * 1000,
+    )
+
+"""
+run benchmark.
+
+@param args argparse.Namespace
+@param path string sqlite database file path.
+"""
+async def run(args, path):
+    module = load_bot_module()
+    module.DateTime = VirtualClock
+
+    for kind in list(RestScheduler.route_limits.keys()):
+        RestScheduler.route_limits[kind] = (10 ** 9, 1.0)
+
+    bot_class = module.SleepinessInc
+    bot_class.state_db_path = path
+    bot_class.grace_period_seconds = 0
+    bot_class.rest_concurrency = args.rest_concurrency
+
+    client = bot_class('benchmark', Logger('ERROR'), launch=False)
+
+    async def change_presence(status=None):
+        count_rest_call('presence')
+
+    client.change_presence = change_presence
+
+    started = time.perf_counter()
+    guilds = {}
+    for guild_id in range(1, args.guilds + 1):
+        guild = FakeGuild(guild_id, args.voice_channels, args.members, args.cached_ratio, client)
+        guild.join_all()
+        guilds[guild_id] = guild
+    client.get_guild = guilds.get
+    build_seconds = time.perf_counter() - started
+
+    zone = timezone(TZ)
+    VirtualClock.current = zone.localize(datetime(2023, 1, 1, 23, 50))
+
+    started = time.perf_counter()
+    for guild in guilds.values():
+        client.channel_index.build(guild)
+        client.voice_index.build(guild)
+        client.execution_time_list_per_guild[guild.id] = list(bot_class.execution_time_list)
+        client.exclude_time_list_per_guild[guild.id] = list(bot_class.exclude_time_list)
+        client.build_schedule(guild)
+        client.schedule_execution(guild)
+
+        if (guild.id % 100 < args.sleeping_percent):
+            client.sleeping_list_per_guild[guild.id] = VirtualClock.current + timedelta(minutes=10)
+            client.get_scheduler(guild).schedule(('awake', guild.id), int(client.sleeping_list_per_guild[guild.id].timestamp()))
+    setup_seconds = time.perf_counter() - started
+
+    scheduler = client.schedulers[0]
+    execute = client.execute
+    tick_started = [0.0]
+    guild_latencies = []
+
+    async def timed_execute(guild, now):
+        await execute(guild, now)
+        guild_latencies.append(time.perf_counter() - tick_started[0])
+
+    client.execute = timed_execute
+
+    def prepare():
+        VirtualClock.current = datetime.fromtimestamp(scheduler.peek()[0], tz=zone)
+        for guild in guilds.values():
+            guild.join_all()
+            client.voice_index.build(guild)
+
+    async def tick():
+        tick_started[0] = time.perf_counter()
+        await client.watch(scheduler.pop_due(VirtualClock.current.timestamp()))
+
+        return time.perf_counter() - tick_started[0]
+
+    print('guilds=%d voice_channels=%d members=%d cached=%.0f%% sleeping=%d%%' % (args.guilds, args.voice_channels, args.members, args.cached_ratio * 100, args.sleeping_percent))
+    print('build fakes:        %.2f s' % (build_seconds))
+    print('schedule setup:     %.2f s' % (setup_seconds))
+
+    tick_seconds = []
+    collections = sum(stat['collections'] for stat in gc.get_stats())
+
+    for index in range(args.ticks):
+        prepare()
+        seconds = await tick()
+        tick_seconds.append(seconds)
+        print('tick %d at %s:  %.2f s' % (index, VirtualClock.current.strftime('%a %H:%M'), seconds))
+
+    print('tick latency:       %s' % (summarize(tick_seconds)))
+    print('guild latency:      %s' % (summarize(guild_latencies)))
+    print('gc collections:     %d' % (sum(stat['collections'] for stat in gc.get_stats()) - collections))
+    print('rest calls:         %s' % (', '.join('%s=%d' % (kind, count) for kind, count in sorted(REST_CALLS.items()))))
+    print('rest per tick:      %.0f' % (sum(REST_CALLS.values()) / max(1, args.ticks)))
+    print('rest scheduler:     %s' % ({key: value for key, value in client.rest.metrics.items() if key != 'wait_seconds_per_priority'}))
+
+    if (args.allocations):
+        prepare()
+        tracemalloc.start(args.trace_depth)
+        snapshot = tracemalloc.take_snapshot()
+        seconds = await tick()
+        current, peak = tracemalloc.get_traced_memory()
+        statistics = tracemalloc.take_snapshot().compare_to(snapshot, 'lineno')
+        tracemalloc.stop()
+
+        print('traced tick:        %.2f s (slowed by tracing)' % (seconds))
+        print('traced peak:        %.1f MiB' % (peak / 1024 / 1024))
+        print('retained blocks:    %d' % (sum(stat.count_diff for stat in statistics if stat.count_diff > 0)))
+
+        for stat in sorted(statistics, key=lambda stat: stat.size_diff, reverse=True)[:args.top]:
+            print('  %s' % (stat))
+
+    client.rest.stop()
+    client.store.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--guilds', type=int, default=1000)
+    parser.add_argument('--voice-channels', type=int, default=50)
+    parser.add_argument('--members', type=int, default=25)
+    parser.add_argument('--cached-ratio', type=float, default=1.0)
+    parser.add_argument('--sleeping-percent', type=int, default=5)
+    parser.add_argument('--ticks', type=int, default=3)
+    parser.add_argument('--rest-concurrency', type=int, default=8)
+    parser.add_argument('--allocations', action='store_true')
+    parser.add_argument('--trace-depth', type=int, default=1)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run(args, os.path.join(directory, 'state.sqlite3')))
@@ -1,3 +1,4 @@
+import asyncio
 import os
 import random
 import time
@@ -5,7 +6,7 @@ import time
 from discord import Client, Status
 from discord.ext import tasks
 
-from utils import Logger, DateTime
+from utils import Logger, DateTime, ChannelIndex, Lifecycle, RestScheduler, Metrics, PRIORITY_REPLY, PRIORITY_NOTIFY, PRIORITY_PRESENCE, PRIORITY_GREETING
 
 """
 GodIllustratorGmk is a discord bot that encourage drawing illustration.
@@ -34,6 +35,16 @@ class GodIllustratorGmk(Client):
     """
     role_name = os.environ.get('ROLE_NAME', 'Illustrator')
 
+    """
+    max number of discord api calls running at the same time.
+    """
+    rest_concurrency = int(os.environ.get('REST_CONCURRENCY', '4'))
+
+    """
+    metrics endpoint port, metrics are not served if empty.
+    """
+    metrics_port = os.environ.get('METRICS_PORT', '')
+
     """
     reply message list.
     """
@@ -50,9 +61,11 @@ class GodIllustratorGmk(Client):
 
     @param token string (required)discord token.
     @param logger Logger (optional)utils.Logger instance.
+    @param launch bool (optional)run a bot in constructor, False to start it later on a running loop.
+    @param options dict (optional)additional discord.Client options, e.g. connector.
     """
-    def __init__(self, token, logger=None):
-        super().__init__()
+    def __init__(self, token, logger=None, launch=True, **options):
+        super().__init__(**options)
 
         if (token is None):
             raise Exception('token is required.')
@@ -60,11 +73,20 @@ class GodIllustratorGmk(Client):
         self.token = token
         self.logger = logger
         self.notify_channel_name = self.__class__.notify_channel_name
+        self.channel_index = ChannelIndex()
 
         if (self.logger is None):
             self.logger = Logger(os.environ.get('LOG_LEVEL', 'INFO'))
 
-        self.run()
+        self.rest = RestScheduler(self.__class__.rest_concurrency, self.logger)
+        self.lifecycle = Lifecycle(self.logger)
+        self.metrics = Metrics('god_illustorator_gmk', self.logger)
+        self.on_message_seconds = self.metrics.histogram('on_message_seconds', 'handling time of a received message.')
+        self.messages_sent_total = self.metrics.counter('messages_sent_total', 'sent messages.', ('priority',))
+        self.metrics.gauge('rest_queue_depth', 'queued discord api calls.').set_function(self.rest.get_queue_depth)
+
+        if (launch):
+            self.run()
 
     """
     launch a bot.
@@ -73,22 +95,114 @@ class GodIllustratorGmk(Client):
         super().run(self.token)
 
     """
-    exec when launched a bot.
+    exec when launched a bot, and again when a reconnect could not resume the session.
     """
     async def on_ready(self):
-        await self.change_presence(status=Status.online)
+        if (self.lifecycle.ready()):
+            await self.start_metrics()
+
+        await self.set_presence(Status.online)
 
         for guild in self.guilds:
-            notify_channel = self.find_channel(guild, self.notify_channel_name)
-            if (notify_channel is not None):
-                await notify_channel.send('Hello everyone! I\'m ready.')
+            self.channel_index.build(guild)
+
+        results = await asyncio.gather(*[self.greet(guild) for guild in self.lifecycle.take_greetings(self.guilds)], return_exceptions=True)
+
+        for result in results:
+            if (isinstance(result, Exception)):
+                self.logger.error('greet failed: %s' % (repr(result)))
 
         # self.watch.start()
 
+    """
+    send greeting to notify channel of guild.
+
+    @param guild discord.Guild
+    """
+    async def greet(self, guild):
+        notify_channel = self.find_channel(guild, self.notify_channel_name)
+
+        if (notify_channel is not None):
+            await self.send(notify_channel, 'Hello everyone! I\'m ready.', PRIORITY_GREETING)
+
+    """
+    exec when joined a guild.
+
+    @param guild discord.Guild
+    """
+    async def on_guild_join(self, guild):
+        self.channel_index.build(guild)
+
+    """
+    exec when left a guild.
+
+    @param guild discord.Guild
+    """
+    async def on_guild_remove(self, guild):
+        self.channel_index.remove_guild(guild)
+
+    """
+    exec when created a channel.
+
+    @param channel discord.abc.GuildChannel
+    """
+    async def on_guild_channel_create(self, channel):
+        self.channel_index.add(channel)
+
+    """
+    exec when deleted a channel.
+
+    @param channel discord.abc.GuildChannel
+    """
+    async def on_guild_channel_delete(self, channel):
+        self.channel_index.remove(channel)
+
+    """
+    exec when updated a channel.
+
+    @param before discord.abc.GuildChannel
+    @param after discord.abc.GuildChannel
+    """
+    async def on_guild_channel_update(self, before, after):
+        self.channel_index.update(before, after)
+
+    """
+    exec when closing a bot.
+    """
+    async def close(self):
+        await super().close()
+        await self.metrics.stop()
+        self.rest.stop()
+
+    """
+    start metrics endpoint if metrics port is set.
+    """
+    async def start_metrics(self):
+        if (self.__class__.metrics_port == ''):
+            return
+
+        try:
+            await self.metrics.start(int(self.__class__.metrics_port))
+        except Exception as e:
+            self.logger.error('failed to start metrics: %s' % (repr(e)))
+
     """
     received an message.
     """
     async def on_message(self, message):
+        started = time.perf_counter()
+
+        try:
+            await self.handle_message(message)
+        finally:
+            self.on_message_seconds.observe(time.perf_counter() - started)
+
+    """
+    handle received message.
+
+    @param message discord.Message
+    """
+    async def handle_message(self, message):
         if (self.find_user_from_list(message.mentions, self.user.name) is None):
             return 
 
@@ -97,7 +211,7 @@ class GodIllustratorGmk(Client):
         
         text = '<@%s>\n%s' % (message.author.id, random.choice(self.__class__.reply_message_list))
 
-        await message.channel.send(text)
+        await self.send(message.channel, text)
 
     """
     .
@@ -147,7 +261,28 @@ class GodIllustratorGmk(Client):
 
         message += text
 
-        await channel.send(message)
+        await self.send(channel, message, PRIORITY_NOTIFY)
+
+    """
+    send message through rest scheduler.
+
+    @param channel discord.abc.Messageable (required)target channel.
+    @param text string (required)message text.
+    @param priority int (optional)utils.PRIORITY_*.
+    @return discord.Message
+    """
+    async def send(self, channel, text, priority=PRIORITY_REPLY):
+        self.messages_sent_total.inc(1, (priority,))
+
+        return await self.rest.submit(priority, 'channel.send:%s' % (channel.id), lambda: channel.send(text))
+
+    """
+    change presence status through rest scheduler.
+
+    @param status discord.Status
+    """
+    async def set_presence(self, status):
+        await self.rest.submit(PRIORITY_PRESENCE, 'presence', lambda: self.change_presence(status=status))
     
     """
     find channel by channel name from guild.
@@ -157,11 +292,7 @@ class GodIllustratorGmk(Client):
     @return discord.Channel or None
     """
     def find_channel(self, guild, name):
-        for channel in guild.channels:
-            if (channel.name == name):
-                return channel
-        
-        return None
+        return self.channel_index.find(guild, name)
     
     """
     find role by role name from guild.
@@ -191,4 +322,5 @@ class GodIllustratorGmk(Client):
         
         return None
 
-client = GodIllustratorGmk(os.environ.get('TOKEN', None))
+if __name__ == '__main__':
+    client = GodIllustratorGmk(os.environ.get('TOKEN', None))
@@ -0,0 +1,240 @@
+import asyncio
+import contextlib
+import importlib.util
+import os
+import signal
+import sys
+
+from aiohttp import TCPConnector
+
+"""
+host that runs several python bots on one event loop in one process.
+
+bots share the interpreter, the imported discord.py and one http connector.
+the environment is parsed once into a config per bot, a variable prefixed by
+the bot name overrides the common one for that bot only,
+e.g. SLEEPINESS_INC_TOKEN is TOKEN of sleepiness-inc.
+a bot failing to start or stopping with an error is logged and closed,
+the other bots keep running.
+
+usage: HOST_BOTS=sleepiness-inc,god-illustorator-gmk,openai python host.py
+"""
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+BOTS = {
+    'sleepiness-inc': ('sleepiness-inc', 'sleepiness-inc.py', 'SleepinessInc'),
+    'god-illustorator-gmk': ('god-illustorator-gmk', 'god-illustorator-gmk.py', 'GodIllustratorGmk'),
+    'openai': ('openai', 'main.py', 'OpenAI'),
+}
+
+"""
+http connector shared by all bots.
+
+discord.py closes the connector with the http session of a bot,
+so close is ignored until the host releases the connector.
+"""
+class SharedConnector(TCPConnector):
+
+    """
+    constructor.
+
+    @param kwargs dict aiohttp.TCPConnector options.
+    """
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.shared = True
+
+    """
+    close connector, ignored while shared.
+    """
+    def close(self):
+        if (self.shared):
+            return asyncio.sleep(0)
+
+        return super().close()
+
+    """
+    close connector after all bots closed.
+    """
+    async def release(self):
+        self.shared = False
+        await self.close()
+
+"""
+return bot names to run.
+
+@param environ dict
+@return list[string]
+"""
+def get_bot_names(environ):
+    names = [name.strip() for name in environ.get('HOST_BOTS', ','.join(BOTS.keys())).split(',') if name.strip() != '']
+
+    for name in names:
+        if (BOTS.get(name) is None):
+            raise Exception('unknown bot %s.' % (name))
+
+    return names
+
+"""
+return environment variable prefix of bot.
+
+@param name string bot name.
+@return string
+"""
+def get_prefix(name):
+    return name.upper().replace('-', '_') + '_'
+
+"""
+parse environment into config per bot.
+
+@param environ dict
+@return dict{string: dict{string: string}} environment per bot name.
+"""
+def load_config(environ):
+    names = get_bot_names(environ)
+    prefixes = [get_prefix(name) for name in BOTS.keys()]
+    common = {key: value for key, value in environ.items() if not any(key.startswith(prefix) for prefix in prefixes)}
+    config = {}
+
+    for name in names:
+        prefix = get_prefix(name)
+        config[name] = dict(common)
+        config[name].update({key[len(prefix):]: value for key, value in environ.items() if key.startswith(prefix)})
+
+    return config
+
+"""
+replace process environment while importing or constructing a bot.
+
+bots read their settings from os.environ on import and construction.
+
+@param env dict{string: string}
+"""
+@contextlib.contextmanager
+def overlay_environ(env):
+    saved = dict(os.environ)
+    os.environ.clear()
+    os.environ.update(env)
+
+    try:
+        yield
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+
+"""
+import bot module with its own copy of local modules.
+
+every bot directory has its own utils.py, so local modules are removed from
+sys.modules after import and the next bot imports its own.
+
+@param name string bot name.
+@param env dict{string: string} environment of bot.
+@return module
+"""
+def load_bot_module(name, env):
+    directory, filename, class_name = BOTS[name]
+    path = os.path.abspath(os.path.join(ROOT, directory))
+    loaded = set(sys.modules.keys())
+    sys.path.insert(0, path)
+
+    try:
+        with overlay_environ(env):
+            spec = importlib.util.spec_from_file_location('bot_%s' % (name.replace('-', '_')), os.path.join(path, filename))
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(path)
+
+        for key in set(sys.modules.keys()) - loaded:
+            file = getattr(sys.modules[key], '__file__', None)
+
+            if (file is not None and os.path.dirname(os.path.abspath(file)) == path):
+                del sys.modules[key]
+
+    return module
+
+"""
+create bot client without running it.
+
+@param name string bot name.
+@param env dict{string: string} environment of bot.
+@param connector aiohttp.BaseConnector shared connector.
+@return discord.Client
+"""
+def create_bot(name, env, connector):
+    module = load_bot_module(name, env)
+    bot_class = getattr(module, BOTS[name][2])
+
+    with overlay_environ(env):
+        logger = module.Logger(env.get('LOG_LEVEL', 'INFO'), name)
+
+        return bot_class(env.get('TOKEN', None), logger, launch=False, connector=connector)
+
+"""
+run bot until it stops, an error stops only this bot.
+
+@param name string bot name.
+@param client discord.Client
+@param logger Logger
+"""
+async def run_bot(name, client, logger):
+    try:
+        client.logger.info('Application starting.')
+        await client.start(client.token)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error('%s stopped: %s' % (name, repr(e)))
+    finally:
+        if (not client.is_closed()):
+            await client.close()
+
+"""
+run bots on this event loop until all of them stop.
+
+@param config dict{string: dict{string: string}} environment per bot name.
+@param logger Logger
+"""
+async def run(config, logger):
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+
+    connector = SharedConnector(limit=int(os.environ.get('HOST_CONNECTOR_LIMIT', '100')))
+    clients = {}
+
+    for name, env in config.items():
+        try:
+            clients[name] = create_bot(name, env, connector)
+        except Exception as e:
+            logger.error('%s failed to start: %s' % (name, repr(e)))
+
+    try:
+        await asyncio.gather(*[run_bot(name, client, logger) for name, client in clients.items()])
+    finally:
+        for client in clients.values():
+            if (not client.is_closed()):
+                await client.close()
+
+        await connector.release()
+
+"""
+return logger of host.
+
+@return Logger
+"""
+def create_logger():
+    spec = importlib.util.spec_from_file_location('host_utils', os.path.join(ROOT, 'sleepiness-inc', 'utils.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module.Logger(os.environ.get('LOG_LEVEL', 'INFO'), 'host')
+
+if __name__ == '__main__':
+    config = load_config(os.environ)
+    logger = create_logger()
+
+    try:
+        asyncio.run(run(config, logger))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
@@ -0,0 +1,115 @@
+import asyncio
+
+import openai
+
+"""
+background compaction of long conversations.
+
+older turns of a conversation over threshold are replaced with a summary written
+by the model. the summary request runs as a task off the request path, at most
+one per conversation key, and the result is merged into the conversation even if
+turns were appended meanwhile.
+"""
+class Compactor():
+
+    """
+    instruction of summary request.
+    """
+    prompt = 'Summarize the conversation below for your own later reference. Keep facts, names, decisions and open questions. Answer in the language of the conversation.'
+
+    """
+    constructor.
+
+    @param token_counter history.TokenCounter (required)
+    @param model string (required)openai chat model name.
+    @param threshold int (required)tokens of conversation that starts compaction.
+    @param keep_messages int (required)latest messages kept as they are.
+    @param store history.ConversationStore (required)store of conversations, sizes are updated after compaction.
+    @param logger Logger (required)utils.Logger instance.
+    """
+    def __init__(self, token_counter, model, threshold, keep_messages, store, logger):
+        self.token_counter = token_counter
+        self.store = store
+        self.model = model
+        self.threshold = threshold
+        self.keep_messages = keep_messages
+        self.logger = logger
+        self.tasks = {}
+
+    """
+    start compaction of conversation if over threshold and not running for key.
+
+    @param key string conversation key.
+    @param conversation history.Conversation
+    @return bool True if started.
+    """
+    def request(self, key, conversation):
+        if (conversation.tokens <= self.threshold or key in self.tasks):
+            return False
+
+        task = asyncio.ensure_future(self.compact(key, conversation))
+        self.tasks[key] = task
+        task.add_done_callback(lambda task: self.on_compacted(key, task))
+
+        return True
+
+    """
+    exec when compaction task finished.
+
+    @param key string conversation key.
+    @param task asyncio.Task
+    """
+    def on_compacted(self, key, task):
+        self.tasks.pop(key, None)
+
+        if (task.cancelled()):
+            return
+
+        if (task.exception() is not None):
+            self.logger.error(f'compaction failed: key={key}, error={task.exception()!r}')
+
+    """
+    replace older turns of conversation with summary.
+
+    @param key string conversation key.
+    @param conversation history.Conversation
+    """
+    async def compact(self, key, conversation):
+        messages = conversation.get_compactable_messages(self.keep_messages)
+
+        if (len(messages) < 2):
+            return
+
+        summary = await self.summarize(messages)
+        message = {'role': 'system', 'content': f'Summary of the earlier conversation: {summary}'}
+        tokens = await self.token_counter.count_async(message)
+        before = conversation.tokens
+
+        if (conversation.replace_with_summary(messages, message, tokens)):
+            self.store.resize(key, conversation)
+            self.logger.info(f'compacted: key={key}, messages={len(messages)}, tokens={before}->{conversation.tokens}')
+
+    """
+    return summary of messages written by the model.
+
+    @param messages list[dict{string: string}] chat messages.
+    @return string
+    """
+    async def summarize(self, messages):
+        transcript = '\n'.join(f'{message["role"]}: {message["content"]}' for message in messages)
+        response = await openai.ChatCompletion.acreate(
+            model=self.model,
+            messages=[
+                {'role': 'system', 'content': self.__class__.prompt},
+                {'role': 'user', 'content': transcript},
+            ],
+        )
+
+        return response.choices[0]['message']['content'].strip()
+
+    """
+    cancel running compactions.
+    """
+    def stop(self):
+        for task in list(self.tasks.values()):
+            task.cancel()
@@ -0,0 +1,338 @@
+import asyncio
+import time
+
+from collections import OrderedDict
+
+import tiktoken
+
+"""
+tokens added to every chat message by the chat format.
+"""
+TOKENS_PER_MESSAGE = 3
+
+"""
+tokens priming every reply of the assistant.
+"""
+TOKENS_PER_REPLY = 3
+
+"""
+encoding of models tiktoken does not know.
+"""
+FALLBACK_ENCODING = 'cl100k_base'
+
+"""
+token counter of chat messages for a model.
+
+tokens are estimated from length while the encoding cannot be loaded.
+"""
+class TokenCounter():
+
+    """
+    seconds before loading the encoding again after a failure.
+    """
+    retry_seconds = 600
+
+    """
+    constructor.
+
+    @param model string openai chat model name.
+    """
+    def __init__(self, model):
+        self.model = model
+        self.encoding = None
+        self.failed_at = None
+
+    """
+    return tokens of chat message, blocking.
+    the encoding is loaded on first call, it may be downloaded.
+
+    @param message dict{string: string} chat message.
+    @return int
+    """
+    def count(self, message):
+        encoding = self.get_encoding()
+
+        if (encoding is None):
+            return estimate_tokens(message)
+
+        return TOKENS_PER_MESSAGE + sum(len(encoding.encode(value, disallowed_special=())) for value in message.values())
+
+    """
+    return encoding of model, loaded on first call.
+
+    @return tiktoken.Encoding or None if it failed to load recently.
+    """
+    def get_encoding(self):
+        if (self.encoding is not None):
+            return self.encoding
+
+        if (self.failed_at is not None and time.monotonic() - self.failed_at < self.__class__.retry_seconds):
+            return None
+
+        try:
+            try:
+                self.encoding = tiktoken.encoding_for_model(self.model)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding(FALLBACK_ENCODING)
+        except Exception:
+            self.failed_at = time.monotonic()
+
+        return self.encoding
+
+    """
+    return tokens of chat message, encoded on a worker thread to keep the event loop free.
+
+    @param message dict{string: string} chat message.
+    @return int
+    """
+    async def count_async(self, message):
+        return await asyncio.to_thread(self.count, message)
+
+"""
+return tokens of chat message estimated from length, about 4 characters per token.
+
+@param message dict{string: string} chat message.
+@return int
+"""
+def estimate_tokens(message):
+    return TOKENS_PER_MESSAGE + sum(len(value) // 4 + 1 for value in message.values())
+
+"""
+approximate bytes of a chat message dict on memory.
+"""
+MESSAGE_OVERHEAD_BYTES = 400
+
+"""
+chat history of a conversation with a ledger of tokens per message.
+
+tokens of a message are counted once when appended, the total is kept up to date.
+a summary written by compaction is a system message, replaced by the next summary.
+"""
+class Conversation():
+
+    """
+    constructor.
+    """
+    def __init__(self):
+        self.messages = []
+        self.token_counts = []
+        self.tokens = 0
+        self.summary = None
+
+    """
+    append chat message.
+
+    @param message dict{string: string} chat message.
+    @param tokens int tokens of message.
+    """
+    def append(self, message, tokens):
+        self.messages.append(message)
+        self.token_counts.append(tokens)
+        self.tokens += tokens
+
+    """
+    return tokens of a request with all messages.
+
+    @return int
+    """
+    def get_prompt_tokens(self):
+        return self.tokens + TOKENS_PER_REPLY
+
+    """
+    drop oldest messages until the request fits budget.
+
+    system messages and the latest message are always kept,
+    so the request may exceed budget if they alone do.
+
+    @param budget int max prompt tokens.
+    @return int number of dropped messages.
+    """
+    def trim(self, budget):
+        if (self.get_prompt_tokens() <= budget):
+            return 0
+
+        excess = self.get_prompt_tokens() - budget
+        last = len(self.messages) - 1
+        dropped = set()
+
+        for index, message in enumerate(self.messages[:last]):
+            if (excess <= 0):
+                break
+
+            if (message['role'] == 'system'):
+                continue
+
+            dropped.add(index)
+            excess -= self.token_counts[index]
+
+        if (len(dropped) == 0):
+            return 0
+
+        self.messages = [message for index, message in enumerate(self.messages) if index not in dropped]
+        self.token_counts = [tokens for index, tokens in enumerate(self.token_counts) if index not in dropped]
+        self.tokens = sum(self.token_counts)
+
+        return len(dropped)
+
+    """
+    return messages to be summarized, the previous summary and older turns.
+
+    @param keep_messages int latest messages kept as they are.
+    @return list[dict{string: string}]
+    """
+    def get_compactable_messages(self, keep_messages):
+        older = self.messages[:max(0, len(self.messages) - keep_messages)]
+
+        return [message for message in older if message['role'] != 'system' or message is self.summary]
+
+    """
+    replace messages with summary, messages dropped meanwhile are ignored.
+
+    @param messages list[dict{string: string}] summarized messages.
+    @param summary dict{string: string} summary chat message.
+    @param tokens int tokens of summary.
+    @return bool False if none of messages is left.
+    """
+    def replace_with_summary(self, messages, summary, tokens):
+        summarized = set(id(message) for message in messages)
+        indexes = [index for index, message in enumerate(self.messages) if id(message) in summarized]
+
+        if (len(indexes) == 0):
+            return False
+
+        kept = [(message, count) for message, count in zip(self.messages, self.token_counts) if id(message) not in summarized]
+        kept.insert(indexes[0], (summary, tokens))
+        self.messages = [message for message, count in kept]
+        self.token_counts = [count for message, count in kept]
+        self.tokens = sum(self.token_counts)
+        self.summary = summary
+
+        return True
+
+    """
+    return approximate bytes of conversation on memory.
+
+    @return int
+    """
+    def get_size(self):
+        return sum(MESSAGE_OVERHEAD_BYTES + len(message['content'].encode()) for message in self.messages)
+
+"""
+conversations per key, bounded by approximate bytes and idle time.
+
+least recently used conversations are evicted over max bytes, and conversations
+idle longer than ttl are dropped, so memory does not grow with the number of channels.
+"""
+class ConversationStore():
+
+    """
+    constructor.
+
+    @param max_bytes int approximate bytes of all conversations.
+    @param ttl_seconds int seconds a conversation is kept since last use.
+    @param logger Logger utils.Logger instance.
+    """
+    def __init__(self, max_bytes, ttl_seconds, logger):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.logger = logger
+        self.entries = OrderedDict()
+        self.bytes = 0
+
+    """
+    return conversation and mark it used.
+
+    @param key string conversation key.
+    @return Conversation or None
+    """
+    def get(self, key):
+        entry = self.entries.get(key)
+
+        if (entry is None):
+            return None
+
+        now = time.monotonic()
+
+        if (now - entry[1] > self.ttl_seconds):
+            self.remove(key)
+            return None
+
+        self.entries[key] = (entry[0], now, entry[2])
+        self.entries.move_to_end(key)
+
+        return entry[0]
+
+    """
+    store conversation, or its changes, and evict over max bytes.
+
+    @param key string conversation key.
+    @param conversation Conversation
+    """
+    def put(self, key, conversation):
+        self.remove(key)
+
+        size = conversation.get_size()
+        self.entries[key] = (conversation, time.monotonic(), size)
+        self.bytes += size
+
+        while (self.bytes > self.max_bytes and len(self.entries) > 1):
+            evicted_key, (evicted, used_at, evicted_size) = self.entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.logger.debug(f'conversation evicted: key={evicted_key}, bytes={evicted_size}')
+
+    """
+    update size of conversation changed in place, keeping its last use.
+    nothing is done if key holds no longer the conversation, e.g. after reset or eviction.
+
+    @param key string conversation key.
+    @param conversation Conversation
+    """
+    def resize(self, key, conversation):
+        entry = self.entries.get(key)
+
+        if (entry is None or entry[0] is not conversation):
+            return
+
+        size = conversation.get_size()
+        self.entries[key] = (conversation, entry[1], size)
+        self.bytes += size - entry[2]
+
+    """
+    remove conversation.
+
+    @param key string conversation key.
+    """
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+
+        if (entry is not None):
+            self.bytes -= entry[2]
+
+    """
+    drop conversations idle longer than ttl.
+
+    @return int number of dropped conversations.
+    """
+    def expire(self):
+        now = time.monotonic()
+        expired = 0
+
+        # entries are in order of last use, so idle ones are at the head.
+        while (len(self.entries) > 0):
+            key, (conversation, used_at, size) = next(iter(self.entries.items()))
+
+            if (now - used_at <= self.ttl_seconds):
+                break
+
+            self.remove(key)
+            expired += 1
+
+        return expired
+
+    """
+    return number of conversations.
+
+    @return int
+    """
+    def __len__(self):
+        return len(self.entries)
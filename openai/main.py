@@ -1,12 +1,18 @@
 import os
 import textwrap
 
+from time import perf_counter
+
 import openai
 
 from discord import Client, MemberCacheFlags, Intents, Status
 from discord.ext import tasks
 
-from utils import Logger, DateTime
+from compaction import Compactor
+from history import Conversation, ConversationStore, TokenCounter, estimate_tokens
+from streaming import StreamingReply
+from turns import TurnQueue
+from utils import Logger, DateTime, Lifecycle, RestScheduler, Metrics, PRIORITY_REPLY, PRIORITY_PRESENCE
 
 openai.api_key = os.environ.get('OPENAI_API_KEY')
 
@@ -16,26 +22,72 @@ OpenAI is a discord bot that based by GPT.
 class OpenAI(Client):
 
     """
-    chat history per guild.
+    chat model.
+    """
+    chat_model = os.environ.get('CHAT_MODEL', 'gpt-3.5-turbo')
+
+    """
+    max tokens of chat history sent in a request, older messages are dropped first.
+    """
+    history_token_budget = int(os.environ.get('HISTORY_TOKEN_BUDGET', '3000'))
+
+    """
+    tokens of chat history that starts summarizing older messages in background.
+    """
+    compaction_threshold_tokens = int(os.environ.get('COMPACTION_THRESHOLD_TOKENS', '2000'))
+
+    """
+    latest messages kept as they are by compaction.
+    """
+    compaction_keep_messages = int(os.environ.get('COMPACTION_KEEP_MESSAGES', '4'))
+
+    """
+    stream chat replies and show them while generated, 1 to enable.
+    """
+    chat_streaming = os.environ.get('CHAT_STREAMING', '1') == '1'
+
+    """
+    min seconds between edits of a streamed reply.
+    """
+    stream_edit_interval_seconds = float(os.environ.get('STREAM_EDIT_INTERVAL_SECONDS', '1.0'))
+
+    """
+    approximate bytes of all chat histories kept, least recently used ones are evicted over it.
+    """
+    history_max_bytes = int(os.environ.get('HISTORY_MAX_BYTES', str(32 * 1024 * 1024)))
+
+    """
+    seconds a chat history is kept since last message.
+    """
+    history_ttl_seconds = int(os.environ.get('HISTORY_TTL_SECONDS', str(6 * 60 * 60)))
+
+    """
+    runtime profile.
+    full: request all intents and cache all members.
+    minimal: request only used intents and cache no members.
+    """
+    runtime_profile = os.environ.get('RUNTIME_PROFILE', 'full')
+
+    """
+    max number of discord api calls running at the same time.
     """
-    chat_histories = {}
+    rest_concurrency = int(os.environ.get('REST_CONCURRENCY', '4'))
 
     """
-    hour that reset chat histories.
+    metrics endpoint port, metrics are not served if empty.
     """
-    history_reset_hour = 6
+    metrics_port = os.environ.get('METRICS_PORT', '')
 
     """
     constructor.
 
     @param token string (required)discord token.
     @param logger Logger (optional)utils.Logger instance.
+    @param launch bool (optional)run a bot in constructor, False to start it later on a running loop.
+    @param options dict (optional)additional discord.Client options, e.g. connector.
     """
-    def __init__(self, token, logger=None):
-        super().__init__(
-            intents = Intents.all(),
-            member_cache_flags = MemberCacheFlags.all()
-        )
+    def __init__(self, token, logger=None, launch=True, **options):
+        super().__init__(**self.__class__.get_client_options(self.__class__.runtime_profile), **options)
 
         if (token is None):
             raise Exception('token is required.')
@@ -46,8 +98,53 @@ class OpenAI(Client):
         if (self.logger is None):
             self.logger = Logger(os.environ.get('LOG_LEVEL', 'INFO'))
 
-        self.logger.info('Application starting.')
-        self.run(self.token)
+        self.rest = RestScheduler(self.__class__.rest_concurrency, self.logger)
+        self.lifecycle = Lifecycle(self.logger)
+        self.token_counter = TokenCounter(self.__class__.chat_model)
+        self.chat_histories = ConversationStore(self.__class__.history_max_bytes, self.__class__.history_ttl_seconds, self.logger)
+        self.chat_turns = TurnQueue(self.run_chat_turn, self.logger)
+        self.compactor = Compactor(self.token_counter, self.__class__.chat_model, self.__class__.compaction_threshold_tokens, self.__class__.compaction_keep_messages, self.chat_histories, self.logger)
+        self.metrics = Metrics('openai', self.logger)
+        self.on_message_seconds = self.metrics.histogram('on_message_seconds', 'handling time of a received message.')
+        self.acreate_seconds = self.metrics.histogram('acreate_seconds', 'latency of openai api requests.', ('kind',))
+        self.acreate_errors_total = self.metrics.counter('acreate_errors_total', 'failed openai api requests.', ('kind',))
+        self.first_visible_token_seconds = self.metrics.histogram('first_visible_token_seconds', 'seconds from chat request until the first text of reply is shown.')
+        self.chat_turn_messages = self.metrics.histogram('chat_turn_messages', 'messages answered by one chat request.', buckets=(1, 2, 3, 5, 10, 20))
+        self.prompt_tokens = self.metrics.histogram('prompt_tokens', 'tokens of chat requests.', buckets=(250, 500, 1000, 2000, 3000, 4000, 8000, 16000))
+        self.messages_sent_total = self.metrics.counter('messages_sent_total', 'sent messages.', ('priority',))
+        self.metrics.gauge('rest_queue_depth', 'queued discord api calls.').set_function(self.rest.get_queue_depth)
+        self.metrics.gauge('chat_turn_queue_depth', 'chat messages waiting for a running request of their conversation.').set_function(self.chat_turns.get_depth)
+        self.metrics.gauge('chat_histories', 'kept chat histories.').set_function(lambda: len(self.chat_histories))
+        self.metrics.gauge('chat_history_bytes', 'approximate bytes of kept chat histories.').set_function(lambda: self.chat_histories.bytes)
+
+        if (launch):
+            self.logger.info('Application starting.')
+            self.run(self.token)
+
+    """
+    return discord.Client options of runtime profile.
+
+    @param profile string (required)runtime profile(full, minimal).
+    @return dict
+    """
+    @classmethod
+    def get_client_options(cls, profile):
+        if (profile == 'full'):
+            return {
+                'intents': Intents.all(),
+                'member_cache_flags': MemberCacheFlags.all(),
+            }
+
+        if (profile == 'minimal'):
+            intents = Intents(guilds=True, guild_messages=True, dm_messages=True)
+
+            return {
+                'intents': intents,
+                'member_cache_flags': MemberCacheFlags.from_intents(intents),
+                'chunk_guilds_at_startup': False,
+            }
+
+        raise Exception('invalid runtime profile.')
 
     """
     exec when launched a bot.
@@ -55,9 +152,35 @@ class OpenAI(Client):
     async def on_ready(self):
         self.logger.debug('on_ready')
 
-        await self.change_presence(status=Status.online)
+        if (self.lifecycle.ready()):
+            await self.start_metrics()
+
+        await self.set_presence(Status.online)
 
-        self.watch.start()
+        if (not self.watch.is_running()):
+            self.watch.start()
+
+    """
+    exec when closing a bot.
+    """
+    async def close(self):
+        await super().close()
+        await self.metrics.stop()
+        self.chat_turns.stop()
+        self.compactor.stop()
+        self.rest.stop()
+
+    """
+    start metrics endpoint if metrics port is set.
+    """
+    async def start_metrics(self):
+        if (self.__class__.metrics_port == ''):
+            return
+
+        try:
+            await self.metrics.start(int(self.__class__.metrics_port))
+        except Exception as e:
+            self.logger.error(f'failed to start metrics: {e!r}')
 
     """
     exec when received an message.
@@ -67,6 +190,19 @@ class OpenAI(Client):
     async def on_message(self, message):
         self.logger.debug('on_message')
 
+        started = perf_counter()
+
+        try:
+            await self.handle_message(message)
+        finally:
+            self.on_message_seconds.observe(perf_counter() - started)
+
+    """
+    handle received message.
+
+    @param message discord.Message
+    """
+    async def handle_message(self, message):
         if (self.find_user_from_list(message.mentions, self.user.name) is None):
             if (self.find_role_from_list(message.role_mentions, self.user.name) is None):
                 return
@@ -115,17 +251,22 @@ class OpenAI(Client):
     """
     loop tasks.
     """
-    @tasks.loop(hours=1)
+    @tasks.loop(minutes=10)
     async def watch(self):
         now = DateTime.now()
         self.logger.debug('started watch at %s.' % (now))
 
-        if (now.hour == self.history_reset_hour):
-            self.reset_all_chat_history()
+        expired = self.chat_histories.expire()
+
+        if (expired > 0):
+            self.logger.info(f'expired {expired} idle chat histories.')
 
     """
     send chat message to openai.
 
+    messages of a conversation are answered in order, messages received while a
+    request of the conversation is running are answered together by the next one.
+
     @param guild discord.Guild?
     @param channel discord.Channel or discord.DMChannel
     @param role string role of chat message
@@ -134,24 +275,111 @@ class OpenAI(Client):
     async def do_openai_chat(self, guild, channel, role, text):
         self.logger.info(f'do_openai_chat: guild={self.get_guild_name(guild)}, channel={self.get_channel_name(channel)}, role={role}, text={" ".join(text.splitlines())}')
 
-        messages = self.get_chat_history(guild, channel) or []
-        messages.append({'role': role, 'content': text})
+        await self.chat_turns.submit(self.get_chat_history_key(guild, channel), (guild, channel, {'role': role, 'content': text}))
+
+    """
+    append queued chat messages of a conversation and request one reply.
+
+    @param key string chat history key.
+    @param turns list[tuple(discord.Guild?, discord.Channel or discord.DMChannel, dict{string: string})]
+    """
+    async def run_chat_turn(self, key, turns):
+        guild, channel = turns[-1][0], turns[-1][1]
+        conversation = self.get_chat_history(guild, channel) or Conversation()
+
+        for turn in turns:
+            message = turn[2]
+            conversation.append(message, await self.count_tokens(message))
+
+        if (len(turns) > 1):
+            self.logger.debug(f'do_openai_chat: batched {len(turns)} messages of {key}.')
+
+        dropped = conversation.trim(self.history_token_budget)
+
+        if (dropped > 0):
+            self.logger.debug(f'do_openai_chat: dropped {dropped} messages over {self.history_token_budget} tokens.')
+
+        self.set_chat_history(guild, channel, conversation)
+        self.chat_turn_messages.observe(len(turns))
+        self.prompt_tokens.observe(conversation.get_prompt_tokens())
 
         async with channel.typing():
+            started = perf_counter()
+
             try:
-                response = await openai.ChatCompletion.acreate(
-                    model='gpt-3.5-turbo',
-                    messages=messages,
-                )
-                reply = response.choices[0]['message']['content'].strip()
+                if (self.chat_streaming):
+                    reply = await self.stream_chat(channel, conversation.messages, started)
+                else:
+                    response = await openai.ChatCompletion.acreate(
+                        model=self.chat_model,
+                        messages=list(conversation.messages),
+                    )
+                    reply = response.choices[0]['message']['content'].strip()
             except Exception as e:
+                self.acreate_errors_total.inc(1, ('chat',))
                 self.logger.error(f'do_openai_chat: {e}')
-                await channel.send(f'Sorry, got an error ({e.__class__}).')
+                await self.send(channel, f'Sorry, got an error ({e.__class__}).')
             else:
-                messages.append({'role': 'assistant', 'content': reply})
-                self.set_chat_history(guild, channel, messages)
+                self.acreate_seconds.observe(perf_counter() - started, ('chat',))
                 self.logger.info(f'do_openai_chat: guild={self.get_guild_name(guild)}, channel={self.get_channel_name(channel)}, reply={" ".join(reply.splitlines())}')
-                await channel.send(reply)
+
+                # nothing was shown, an empty turn is not kept in history.
+                if (reply == ''):
+                    await self.send(channel, 'Sorry, got an empty reply.')
+                    return
+
+                if (not self.chat_streaming):
+                    await self.send(channel, reply)
+
+                message = {'role': 'assistant', 'content': reply}
+                conversation.append(message, await self.count_tokens(message))
+                self.set_chat_history(guild, channel, conversation)
+                self.compactor.request(key, conversation)
+
+    """
+    return tokens of chat message, estimated from length if counting failed.
+
+    @param message dict{string: string} chat message.
+    @return int
+    """
+    async def count_tokens(self, message):
+        try:
+            return await self.token_counter.count_async(message)
+        except Exception as e:
+            self.logger.error(f'count_tokens: {e!r}')
+
+            return estimate_tokens(message)
+
+    """
+    stream chat completion and show reply while generated.
+
+    @param channel discord.Channel or discord.DMChannel
+    @param messages list[dict{string: string}] chat messages.
+    @param started float perf_counter of request start.
+    @return string reply.
+    """
+    async def stream_chat(self, channel, messages, started):
+        reply = StreamingReply(lambda text: self.send(channel, text), lambda message, text: self.edit(channel, message, text), self.stream_edit_interval_seconds)
+
+        try:
+            response = await openai.ChatCompletion.acreate(
+                model=self.chat_model,
+                messages=list(messages),
+                stream=True,
+            )
+
+            async for chunk in response:
+                delta = chunk.choices[0]['delta'].get('content')
+
+                if (delta):
+                    reply.append(delta)
+        finally:
+            await reply.finish()
+
+        if (reply.first_visible_at is not None):
+            self.first_visible_token_seconds.observe(reply.first_visible_at - started)
+
+        return reply.text.strip()
 
     """
     send image message to openai.
@@ -164,6 +392,8 @@ class OpenAI(Client):
         self.logger.info(f'do_openai_image: guild={self.get_guild_name(guild)}, channel={self.get_channel_name(channel)}, text={" ".join(text.splitlines())}')
 
         async with channel.typing():
+            started = perf_counter()
+
             try:
                 response = await openai.Image.acreate(
                     prompt=text,
@@ -172,11 +402,13 @@ class OpenAI(Client):
                 )
                 reply = response['data'][0]['url']
             except Exception as e:
+                self.acreate_errors_total.inc(1, ('image',))
                 self.logger.error(f'do_openai_image: {e}')
-                await channel.send(f'Sorry, got an error ({e.__class__}).')
+                await self.send(channel, f'Sorry, got an error ({e.__class__}).')
             else:
+                self.acreate_seconds.observe(perf_counter() - started, ('image',))
                 self.logger.info(f'do_openai_image: guild={self.get_guild_name(guild)}, channel={self.get_channel_name(channel)}, reply={" ".join(reply.splitlines())}')
-                await channel.send(reply)
+                await self.send(channel, reply)
 
 
     """
@@ -186,13 +418,13 @@ class OpenAI(Client):
     @param channel discord.Channel or discord.DMChannel
     """
     async def do_history(self, guild, channel):
-        histories = self.get_chat_history(guild, channel)
+        conversation = self.get_chat_history(guild, channel)
 
-        if (histories is None):
-            await channel.send('histories are empty.')
+        if (conversation is None):
+            await self.send(channel, 'histories are empty.')
             return
 
-        await channel.send(histories)
+        await self.send(channel, conversation.messages)
 
     """
     reset chat histories.
@@ -203,7 +435,7 @@ class OpenAI(Client):
     async def do_reset_history(self, guild, channel):
         self.set_chat_history(guild, channel, None)
         self.logger.debug(f'do_reset_history: guild={self.get_guild_name(guild)}, channel={self.get_channel_name(channel)}')
-        await channel.send('reset history.')
+        await self.send(channel, 'reset history.')
 
     """
     help.
@@ -224,7 +456,39 @@ class OpenAI(Client):
         ```
         """).strip()
 
-        await channel.send(text)
+        await self.send(channel, text)
+
+    """
+    send message through rest scheduler.
+
+    @param channel discord.abc.Messageable (required)target channel.
+    @param text string (required)message text.
+    @param priority int (optional)utils.PRIORITY_*.
+    @return discord.Message
+    """
+    async def send(self, channel, text, priority=PRIORITY_REPLY):
+        self.messages_sent_total.inc(1, (priority,))
+
+        return await self.rest.submit(priority, f'channel.send:{channel.id}', lambda: channel.send(text))
+
+    """
+    edit message through rest scheduler.
+
+    @param channel discord.abc.Messageable (required)channel of message.
+    @param message discord.Message (required)target message.
+    @param text string (required)new message text.
+    @param priority int (optional)utils.PRIORITY_*.
+    """
+    async def edit(self, channel, message, text, priority=PRIORITY_REPLY):
+        await self.rest.submit(priority, f'message.edit:{channel.id}', lambda: message.edit(content=text))
+
+    """
+    change presence status through rest scheduler.
+
+    @param status discord.Status
+    """
+    async def set_presence(self, status):
+        await self.rest.submit(PRIORITY_PRESENCE, 'presence', lambda: self.change_presence(status=status))
 
     """
     find user by user name from user list.
@@ -298,7 +562,7 @@ class OpenAI(Client):
 
     @param guild discord.Guild
     @param channel discord.Channel or discord.DMChannel
-    @return array
+    @return history.Conversation or None
     """
     def get_chat_history(self, guild, channel):
         key = self.get_chat_history_key(guild, channel)
@@ -310,18 +574,17 @@ class OpenAI(Client):
 
     @param guild discord.Guild
     @param channel discord.Channel or discord.DMChannel
-    @param histories array
+    @param conversation history.Conversation or None to reset.
     """
-    def set_chat_history(self, guild, channel, histories):
+    def set_chat_history(self, guild, channel, conversation):
         key = self.get_chat_history_key(guild, channel)
 
-        self.chat_histories[key] = histories
+        if (conversation is None):
+            self.chat_histories.remove(key)
+            return
 
-    """
-    reset all chat history
-    """
-    def reset_all_chat_history(self):
-        self.chat_histories = {}
+        self.chat_histories.put(key, conversation)
 
 
-client = OpenAI(os.environ.get('TOKEN', None))
+if __name__ == '__main__':
+    client = OpenAI(os.environ.get('TOKEN', None))
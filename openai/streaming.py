@@ -0,0 +1,137 @@
+import asyncio
+
+from time import perf_counter
+
+"""
+reply shown progressively while a completion is streamed.
+
+the first text is posted as soon as it arrives, later text is shown by editing
+the message at most once per interval, so deltas arriving meanwhile are coalesced
+into one edit. text over the discord message length limit continues on a new message.
+"""
+class StreamingReply():
+
+    """
+    max length of a discord message.
+    """
+    message_length_limit = 2000
+
+    """
+    constructor.
+
+    @param send coroutine function (required)post text as new message, return discord.Message.
+    @param edit coroutine function (required)replace text of discord.Message.
+    @param edit_interval_seconds float (required)min seconds between updates.
+    """
+    def __init__(self, send, edit, edit_interval_seconds):
+        self.send = send
+        self.edit = edit
+        self.edit_interval_seconds = edit_interval_seconds
+        self.text = ''
+        self.offset = 0
+        self.message = None
+        self.shown = ''
+        self.changed = asyncio.Event()
+        self.finished = asyncio.Event()
+        self.closed = False
+        self.task = None
+        self.first_visible_at = None
+        self.updates = 0
+
+    """
+    append streamed text.
+
+    @param delta string
+    """
+    def append(self, delta):
+        self.text += delta
+        self.changed.set()
+
+        if (self.task is None):
+            self.task = asyncio.ensure_future(self.update_loop())
+
+    """
+    show all text and stop updating.
+    """
+    async def finish(self):
+        self.closed = True
+        self.changed.set()
+        self.finished.set()
+
+        if (self.task is not None):
+            await self.task
+
+    """
+    update messages when text changed, at most once per interval.
+    """
+    async def update_loop(self):
+        while (True):
+            await self.changed.wait()
+            self.changed.clear()
+            closed = self.closed
+            await self.update()
+
+            if (closed):
+                return
+
+            try:
+                await asyncio.wait_for(self.finished.wait(), timeout=self.edit_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    """
+    make messages show text so far.
+    """
+    async def update(self):
+        while (True):
+            text = self.text[self.offset:]
+
+            if (len(text) <= self.__class__.message_length_limit):
+                await self.show(text)
+                return
+
+            cut = split_point(text, self.__class__.message_length_limit)
+            await self.show(text[:cut])
+            self.offset += cut
+            self.message = None
+            self.shown = ''
+
+    """
+    post or edit current message.
+
+    @param text string
+    """
+    async def show(self, text):
+        text = text.strip()
+
+        if (text == '' or text == self.shown):
+            return
+
+        if (self.message is None):
+            self.message = await self.send(text)
+
+            if (self.first_visible_at is None):
+                self.first_visible_at = perf_counter()
+        else:
+            await self.edit(self.message, text)
+
+        self.shown = text
+        self.updates += 1
+
+"""
+return length of the head of text to post in one message.
+
+splits on the last line break or space in the second half of limit if any.
+
+@param text string
+@param limit int
+@return int
+"""
+def split_point(text, limit):
+    for separator in ('\n', ' '):
+        index = text.rfind(separator, limit // 2, limit)
+
+        if (index > 0):
+            return index + 1
+
+    return limit
@@ -0,0 +1,87 @@
+import asyncio
+
+"""
+per conversation queue of chat turns.
+
+turns of a conversation key are handled one at a time in order by a worker task,
+and turns submitted while one is handled are batched and handled together next,
+so a burst of messages makes one request. different keys run in parallel, a
+worker exits when its key has nothing pending.
+"""
+class TurnQueue():
+
+    """
+    constructor.
+
+    @param handler coroutine function (required)handle list of turns of a key, called with key and list.
+    @param logger Logger (required)utils.Logger instance.
+    """
+    def __init__(self, handler, logger):
+        self.handler = handler
+        self.logger = logger
+        self.pending = {}
+        self.workers = {}
+
+    """
+    queue turn of key.
+
+    @param key string conversation key.
+    @param turn object passed to handler.
+    @return asyncio.Future done when the batch of turn is handled.
+    """
+    def submit(self, key, turn):
+        future = asyncio.get_running_loop().create_future()
+        self.pending.setdefault(key, []).append((turn, future))
+
+        if (key not in self.workers):
+            self.workers[key] = asyncio.ensure_future(self.work(key))
+
+        return future
+
+    """
+    handle pending turns of key until none is left.
+
+    @param key string conversation key.
+    """
+    async def work(self, key):
+        batch = []
+
+        try:
+            while (self.pending.get(key)):
+                batch = self.pending.pop(key)
+
+                try:
+                    await self.handler(key, [turn for turn, future in batch])
+                except Exception as e:
+                    self.logger.error(f'turn failed: key={key}, turns={len(batch)}, error={e!r}')
+
+                for turn, future in batch:
+                    if (not future.done()):
+                        future.set_result(None)
+        finally:
+            self.workers.pop(key, None)
+
+            # only left undone when the worker is cancelled.
+            for turn, future in batch:
+                future.cancel()
+
+    """
+    return number of turns waiting for a worker.
+
+    @return int
+    """
+    def get_depth(self):
+        return sum(len(batch) for batch in self.pending.values())
+
+    """
+    cancel workers and pending turns.
+    """
+    def stop(self):
+        for task in list(self.workers.values()):
+            task.cancel()
+
+        for batch in self.pending.values():
+            for turn, future in batch:
+                future.cancel()
+
+        self.pending.clear()
@@ -1,5 +1,10 @@
+import asyncio
+import bisect
+import itertools
 import os
+import time
 
+from aiohttp import web
 from datetime import datetime
 from pytz import timezone
 
@@ -9,6 +14,12 @@ LOGGING_LEVEL_ERROR = 'ERROR'
 LOGGING_LEVEL_FATAL = 'FATAL'
 LOGGING_LEVEL_NONE  = 'NONE'
 
+PRIORITY_DISCONNECT = 0
+PRIORITY_REPLY      = 1
+PRIORITY_NOTIFY     = 2
+PRIORITY_PRESENCE   = 3
+PRIORITY_GREETING   = 4
+
 TZ = os.getenv('TZ')
 
 """
@@ -27,13 +38,15 @@ class Logger():
     constructor.
 
     @param log_level string (required)logging level(DEBUG, INFO, ERROR, FATAL, NONE).
+    @param name string (optional)prefix of every line, to tell bots apart in one process.
     """
-    def __init__(self, log_level = LOGGING_LEVEL_INFO):
+    def __init__(self, log_level = LOGGING_LEVEL_INFO, name = None):
 
         if (log_level not in self.__class__.log_level_list):
             raise Exception('invalid log level.')
 
         self.log_level = log_level
+        self.prefix = '' if name is None else '[%s] ' % (name)
 
     """
     output log on DEBUG level.
@@ -42,7 +55,7 @@ class Logger():
         if (not self.can_logging_debug()):
             return
 
-        print('[DEBUG] %s' % (text), flush=True)
+        print('[DEBUG] %s%s' % (self.prefix, text), flush=True)
 
     """
     output log on INFO level.
@@ -51,7 +64,7 @@ class Logger():
         if (not self.can_logging_info()):
             return
 
-        print('[INFO] %s' % (text), flush=True)
+        print('[INFO] %s%s' % (self.prefix, text), flush=True)
 
     """
     output log on ERROR level.
@@ -60,7 +73,7 @@ class Logger():
         if (not self.can_logging_error()):
             return
 
-        print('[ERROR] %s' % (text), flush=True)
+        print('[ERROR] %s%s' % (self.prefix, text), flush=True)
 
     """
     output log on FATAL level.
@@ -69,7 +82,7 @@ class Logger():
         if (not self.can_logging_fatal()):
             return
 
-        print('[FATAL] %s' % (text), flush=True)
+        print('[FATAL] %s%s' % (self.prefix, text), flush=True)
     
     """
     return can logging debug level message.
@@ -141,11 +154,682 @@ class Logger():
 datetime warrper class.
 """
 class DateTime():
+
+    """
+    time zone objects per zone name, built once.
+    """
+    zones = {}
+
     """
     return now datetime.
 
+    @param zone_name string (optional)time zone name, TZ if omitted.
     @return datetime.datetime
     """
     @classmethod
-    def now(cls):
-        return datetime.now(tz=timezone(TZ)).replace(microsecond=0)
+    def now(cls, zone_name=None):
+        return datetime.now(tz=cls.get_zone(zone_name)).replace(microsecond=0)
+
+    """
+    return cached time zone.
+
+    @param zone_name string (optional)time zone name, TZ if omitted.
+    @return pytz timezone, raises pytz.UnknownTimeZoneError if unknown.
+    """
+    @classmethod
+    def get_zone(cls, zone_name=None):
+        if (zone_name is None):
+            zone_name = TZ
+
+        zone = cls.zones.get(zone_name)
+
+        if (zone is None):
+            zone = timezone(zone_name)
+            cls.zones[zone_name] = zone
+
+        return zone
+
+"""
+lifecycle of a client across gateway reconnects.
+
+on_ready fires again after a reconnect that could not resume the session,
+this tells the first start from the following ones and greets each guild once.
+"""
+class Lifecycle():
+    """
+    constructor.
+
+    @param logger Logger (required)utils.Logger instance.
+    """
+    def __init__(self, logger):
+        self.logger = logger
+        self.ready_count = 0
+        self.greeted_guild_ids = set()
+
+    """
+    record ready.
+
+    @return bool True on first start of process.
+    """
+    def ready(self):
+        self.ready_count += 1
+
+        if (self.ready_count > 1):
+            self.logger.info('ready again after reconnect, %s times.' % (self.ready_count))
+
+        return self.ready_count == 1
+
+    """
+    return guilds not greeted yet and mark them greeted.
+
+    @param guilds list[discord.Guild]
+    @return list[discord.Guild]
+    """
+    def take_greetings(self, guilds):
+        guilds = [guild for guild in guilds if guild.id not in self.greeted_guild_ids]
+        self.greeted_guild_ids.update(guild.id for guild in guilds)
+
+        return guilds
+
+"""
+token bucket rate limiter.
+"""
+class TokenBucket():
+    """
+    constructor.
+
+    @param capacity int (required)max number of requests in period.
+    @param period float (required)period seconds.
+    """
+    def __init__(self, capacity, period):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0
+
+    """
+    refill tokens by elapsed time.
+    """
+    def refill(self):
+        now = time.monotonic()
+
+        if (now < self.updated_at):
+            return
+
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    """
+    return seconds until a token is available.
+
+    @return float 0 if available now.
+    """
+    def get_delay(self):
+        self.refill()
+        blocked = self.blocked_until - time.monotonic()
+
+        if (blocked > 0):
+            return blocked
+
+        if (self.tokens >= 1):
+            return 0
+
+        return (1 - self.tokens) / self.rate
+
+    """
+    consume a token.
+    """
+    def consume(self):
+        self.refill()
+        self.tokens -= 1
+
+    """
+    block bucket, used when rate limited by server.
+    a request may run when the block ends, tokens refill from then on.
+
+    @param seconds float
+    """
+    def block(self, seconds):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 1
+        self.updated_at = self.blocked_until
+
+"""
+outbound discord request scheduler with per route token buckets and priority queue.
+
+lower priority value runs first, requests rate limited by server (status 429) are retried
+after the delay the server tells, or with backoff if it tells none.
+discord.py retries rate limited requests itself first, so only the ones it gives up on are
+retried here and counted as rate_limited, e.g. after its retries ran out or on a cloudflare ban.
+"""
+class RestScheduler():
+
+    """
+    rate limit per route kind, (capacity, period seconds).
+    """
+    route_limits = {
+        'global': (50, 1.0),
+        'channel.send': (5, 5.0),
+        'message.edit': (5, 5.0),
+        'member.edit': (10, 10.0),
+        'member.fetch': (10, 10.0),
+        'presence': (5, 60.0),
+    }
+
+    """
+    rate limit of route kinds not in route_limits.
+    """
+    default_route_limit = (5, 5.0)
+
+    """
+    max retry count on rate limited.
+    """
+    max_retries = 5
+
+    """
+    base seconds of exponential backoff when server does not tell retry after.
+    """
+    backoff_seconds = 1.0
+
+    """
+    constructor.
+
+    @param concurrency int (required)number of requests running at the same time.
+    @param logger Logger (required)utils.Logger instance.
+    """
+    def __init__(self, concurrency, logger):
+        if (concurrency < 1):
+            raise Exception('concurrency must be greater than or equal 1.')
+
+        self.concurrency = concurrency
+        self.logger = logger
+        self.queue = None
+        self.workers = []
+        self.buckets = {}
+        self.counter = itertools.count()
+        self.delayed = 0
+        self.metrics = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'rate_limited': 0,
+            'wait_seconds_per_priority': {},
+        }
+
+    """
+    submit request and wait for result.
+
+    @param priority int PRIORITY_*.
+    @param route string route key, "<kind>:<major parameter>" e.g. "channel.send:1234".
+    @param factory callable (required)return coroutine of request, called on every attempt.
+    @return result of request.
+    """
+    async def submit(self, priority, route, factory):
+        if (self.queue is None):
+            self.start()
+
+        job = {
+            'route': route,
+            'factory': factory,
+            'future': asyncio.get_event_loop().create_future(),
+            'enqueued_at': time.monotonic(),
+            'attempt': 0,
+        }
+        self.metrics['submitted'] += 1
+        self.queue.put_nowait((priority, next(self.counter), job))
+
+        return await job['future']
+
+    """
+    start workers.
+    """
+    def start(self):
+        self.queue = asyncio.PriorityQueue()
+        self.workers = [asyncio.ensure_future(self.work()) for _ in range(self.concurrency)]
+
+    """
+    stop workers.
+    """
+    def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+
+        self.workers = []
+
+    """
+    return bucket of route.
+
+    @param route string route key.
+    @return TokenBucket
+    """
+    def get_bucket(self, route):
+        if (self.buckets.get(route) is None):
+            kind = route.split(':', 1)[0]
+            capacity, period = self.__class__.route_limits.get(kind, self.__class__.default_route_limit)
+            self.buckets[route] = TokenBucket(capacity, period)
+
+        return self.buckets[route]
+
+    """
+    worker loop.
+    """
+    async def work(self):
+        while (True):
+            priority, seq, job = await self.queue.get()
+
+            if (job['future'].done()):
+                continue
+
+            buckets = [self.get_bucket('global'), self.get_bucket(job['route'])]
+            delay = max(bucket.get_delay() for bucket in buckets)
+
+            if (delay > 0):
+                self.put_later(delay, (priority, seq, job))
+                continue
+
+            for bucket in buckets:
+                bucket.consume()
+
+            await self.execute(priority, seq, job)
+
+    """
+    put job back to queue after delay, without holding a worker.
+
+    @param delay float seconds.
+    @param item tuple(priority, seq, job)
+    """
+    def put_later(self, delay, item):
+        self.delayed += 1
+
+        def put():
+            self.delayed -= 1
+            self.queue.put_nowait(item)
+
+        asyncio.get_event_loop().call_later(delay, put)
+
+    """
+    execute job.
+
+    @param priority int
+    @param seq int
+    @param job dict
+    """
+    async def execute(self, priority, seq, job):
+        if (job['attempt'] == 0):
+            self.record_wait(priority, time.monotonic() - job['enqueued_at'])
+
+        try:
+            result = await job['factory']()
+        except Exception as e:
+            if (getattr(e, 'status', None) == 429 and job['attempt'] < self.__class__.max_retries):
+                retry_after = get_retry_after(e)
+
+                if (retry_after is None):
+                    retry_after = self.__class__.backoff_seconds * (2 ** job['attempt'])
+
+                self.logger.info('rate limited on %s, retry after %.2f seconds.' % (job['route'], retry_after))
+                self.metrics['rate_limited'] += 1
+                self.get_bucket(job['route']).block(retry_after)
+                job['attempt'] += 1
+                self.put_later(retry_after, (priority, seq, job))
+                return
+
+            self.metrics['failed'] += 1
+            if (not job['future'].done()):
+                job['future'].set_exception(e)
+        else:
+            self.metrics['completed'] += 1
+            if (not job['future'].done()):
+                job['future'].set_result(result)
+
+    """
+    record queue wait time.
+
+    @param priority int
+    @param seconds float
+    """
+    def record_wait(self, priority, seconds):
+        wait = self.metrics['wait_seconds_per_priority'].setdefault(priority, {'count': 0, 'sum': 0.0, 'max': 0.0})
+        wait['count'] += 1
+        wait['sum'] += seconds
+        wait['max'] = max(wait['max'], seconds)
+
+    """
+    return queue depth, including jobs waiting for rate limit.
+
+    @return int
+    """
+    def get_queue_depth(self):
+        if (self.queue is None):
+            return 0
+
+        return self.queue.qsize() + self.delayed
+
+"""
+return seconds to wait before retrying a rate limited request, told by server.
+
+@param e discord.HTTPException
+@return float or None if server did not tell.
+"""
+def get_retry_after(e):
+    headers = getattr(getattr(e, 'response', None), 'headers', None)
+
+    if (headers is None):
+        return None
+
+    for name in ('Retry-After', 'X-RateLimit-Reset-After'):
+        try:
+            return max(0.0, float(headers[name]))
+        except (KeyError, ValueError):
+            continue
+
+    return None
+
+"""
+format prometheus labels.
+
+@param names tuple[string] label names.
+@param values tuple label values.
+@param extra string (optional)additional formatted label, e.g. le="0.1".
+@return string
+"""
+def format_labels(names, values, extra=None):
+    pairs = ['%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"')) for name, value in zip(names, values)]
+
+    if (extra is not None):
+        pairs.append(extra)
+
+    if (len(pairs) == 0):
+        return ''
+
+    return '{%s}' % (','.join(pairs))
+
+"""
+monotonic counter metric.
+"""
+class Counter():
+    """
+    constructor.
+
+    @param name string metric name.
+    @param help string metric description.
+    @param labels tuple[string] label names.
+    """
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+
+    """
+    increment counter.
+
+    @param amount int or float
+    @param labels tuple label values in order of label names.
+    """
+    def inc(self, amount=1, labels=()):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    """
+    return lines of prometheus text format.
+
+    @return list[string]
+    """
+    def render(self):
+        lines = ['# HELP %s %s' % (self.name, self.help), '# TYPE %s counter' % (self.name)]
+
+        for labels, value in self.values.items():
+            lines.append('%s%s %s' % (self.name, format_labels(self.labels, labels), value))
+
+        return lines
+
+"""
+gauge metric, set directly or read from a function on render.
+"""
+class Gauge():
+    """
+    constructor.
+
+    @param name string metric name.
+    @param help string metric description.
+    @param labels tuple[string] label names.
+    """
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+        self.function = None
+
+    """
+    set gauge.
+
+    @param value int or float
+    @param labels tuple label values in order of label names.
+    """
+    def set(self, value, labels=()):
+        self.values[labels] = value
+
+    """
+    read gauge from function on render.
+
+    @param function callable return int or float.
+    """
+    def set_function(self, function):
+        self.function = function
+
+    """
+    return lines of prometheus text format.
+
+    @return list[string]
+    """
+    def render(self):
+        lines = ['# HELP %s %s' % (self.name, self.help), '# TYPE %s gauge' % (self.name)]
+
+        if (self.function is not None):
+            lines.append('%s %s' % (self.name, self.function()))
+
+        for labels, value in self.values.items():
+            lines.append('%s%s %s' % (self.name, format_labels(self.labels, labels), value))
+
+        return lines
+
+"""
+histogram metric with fixed buckets.
+
+an observation increments one bucket, buckets are accumulated on render.
+"""
+class Histogram():
+    """
+    constructor.
+
+    @param name string metric name.
+    @param help string metric description.
+    @param buckets tuple[float] sorted upper bounds.
+    @param labels tuple[string] label names.
+    """
+    def __init__(self, name, help, buckets, labels=()):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.labels = labels
+        self.states = {}
+
+    """
+    observe value.
+
+    @param value float
+    @param labels tuple label values in order of label names.
+    """
+    def observe(self, value, labels=()):
+        state = self.states.get(labels)
+
+        if (state is None):
+            state = [[0] * (len(self.buckets) + 1), 0.0]
+            self.states[labels] = state
+
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    """
+    return lines of prometheus text format.
+
+    @return list[string]
+    """
+    def render(self):
+        lines = ['# HELP %s %s' % (self.name, self.help), '# TYPE %s histogram' % (self.name)]
+
+        for labels, (counts, total) in self.states.items():
+            cumulative = 0
+
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append('%s_bucket%s %d' % (self.name, format_labels(self.labels, labels, 'le="%s"' % (bound)), cumulative))
+
+            cumulative += counts[-1]
+            lines.append('%s_bucket%s %d' % (self.name, format_labels(self.labels, labels, 'le="+Inf"'), cumulative))
+            lines.append('%s_sum%s %s' % (self.name, format_labels(self.labels, labels), total))
+            lines.append('%s_count%s %d' % (self.name, format_labels(self.labels, labels), cumulative))
+
+        return lines
+
+"""
+metrics registry served as prometheus text format.
+"""
+class Metrics():
+
+    """
+    default histogram upper bounds in seconds.
+    """
+    default_buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+    """
+    seconds between event loop lag samples.
+    """
+    lag_interval_seconds = 1.0
+
+    """
+    constructor.
+
+    @param namespace string prefix of metric names.
+    @param logger Logger (required)utils.Logger instance.
+    """
+    def __init__(self, namespace, logger):
+        self.namespace = namespace
+        self.logger = logger
+        self.families = []
+        self.runner = None
+        self.lag_task = None
+        self.loop_lag = self.histogram('event_loop_lag_seconds', 'delay of event loop wakeups.')
+
+    """
+    register counter.
+
+    @param name string metric name without namespace.
+    @param help string metric description.
+    @param labels tuple[string] label names.
+    @return Counter
+    """
+    def counter(self, name, help, labels=()):
+        return self.register(Counter('%s_%s' % (self.namespace, name), help, labels))
+
+    """
+    register gauge.
+
+    @param name string metric name without namespace.
+    @param help string metric description.
+    @param labels tuple[string] label names.
+    @return Gauge
+    """
+    def gauge(self, name, help, labels=()):
+        return self.register(Gauge('%s_%s' % (self.namespace, name), help, labels))
+
+    """
+    register histogram.
+
+    @param name string metric name without namespace.
+    @param help string metric description.
+    @param labels tuple[string] label names.
+    @param buckets tuple[float] (optional)sorted upper bounds.
+    @return Histogram
+    """
+    def histogram(self, name, help, labels=(), buckets=None):
+        return self.register(Histogram('%s_%s' % (self.namespace, name), help, buckets or self.__class__.default_buckets, labels))
+
+    """
+    register metric.
+
+    @param metric Counter, Gauge or Histogram
+    @return metric
+    """
+    def register(self, metric):
+        self.families.append(metric)
+
+        return metric
+
+    """
+    return all metrics in prometheus text format.
+
+    @return string
+    """
+    def render(self):
+        lines = []
+
+        for family in self.families:
+            lines.extend(family.render())
+
+        return '\n'.join(lines) + '\n'
+
+    """
+    start metrics endpoint and event loop lag sampling, does nothing if already started.
+
+    @param port int listen port.
+    @param host string (optional)listen address.
+    """
+    async def start(self, port, host='127.0.0.1'):
+        if (self.runner is not None):
+            return
+
+        app = web.Application()
+        app.router.add_get('/metrics', self.handle)
+
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host, port).start()
+        self.lag_task = asyncio.ensure_future(self.sample_loop_lag())
+
+        self.logger.info('metrics listening on %s:%s.' % (host, port))
+
+    """
+    stop metrics endpoint.
+    """
+    async def stop(self):
+        if (self.lag_task is not None):
+            self.lag_task.cancel()
+            self.lag_task = None
+
+        if (self.runner is not None):
+            await self.runner.cleanup()
+            self.runner = None
+
+    """
+    serve metrics.
+
+    @param request aiohttp.web.Request
+    @return aiohttp.web.Response
+    """
+    async def handle(self, request):
+        return web.Response(body=self.render().encode(), headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+    """
+    sample how late the event loop wakes up from sleep.
+    """
+    async def sample_loop_lag(self):
+        loop = asyncio.get_event_loop()
+        interval = self.__class__.lag_interval_seconds
+
+        while (True):
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            self.loop_lag.observe(max(0.0, loop.time() - expected))
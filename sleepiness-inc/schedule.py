@@ -0,0 +1,515 @@
+import bisect
+import functools
+
+from datetime import datetime, timedelta
+from pytz import AmbiguousTimeError, NonExistentTimeError
+
+MINUTES_PER_DAY = 1440
+
+WEEKDAY_NAMES = [
+    'Monday',
+    'Tuesday',
+    'Wednesday',
+    'Thursday',
+    'Friday',
+    'Saturday',
+    'Sunday',
+]
+
+"""
+bitmask of the same minute on every weekday.
+"""
+DAILY_MASK = sum(1 << (weekday * MINUTES_PER_DAY) for weekday in range(7))
+
+"""
+bitmask of every minute of a day.
+"""
+DAY_MASK = (1 << MINUTES_PER_DAY) - 1
+
+"""
+minute-of-week bitmap schedule.
+
+bit n is set when the schedule is active on minute n of the week, Monday 00:00 is 0.
+"""
+class WeeklySchedule():
+    """
+    constructor.
+    """
+    def __init__(self):
+        self.bits = 0
+
+    """
+    add all minutes of a compiled bitmask.
+
+    @param bits int minute-of-week bitmask.
+    """
+    def update(self, bits):
+        self.bits |= bits
+
+    """
+    return schedule is active on minute of week.
+
+    @param minute int minute of week.
+    @return bool
+    """
+    def contains(self, minute):
+        return (self.bits >> minute) & 1 == 1
+
+"""
+utc fire instants of a weekly schedule on a time zone, precomputed for a horizon.
+"""
+class FireInstants():
+
+    """
+    days precomputed at once.
+    """
+    horizon_days = 8
+
+    """
+    constructor.
+
+    @param schedule WeeklySchedule (required)schedule on local time.
+    @param zone pytz timezone (required)local time zone.
+    """
+    def __init__(self, schedule, zone):
+        self.schedule = schedule
+        self.zone = zone
+        self.instants = []
+        self.start = None
+        self.end = None
+
+    """
+    return next fire instant strictly after.
+
+    @param after int unix time seconds.
+    @return int unix time seconds or None if schedule is empty.
+    """
+    def next(self, after):
+        if (self.start is None or after < self.start or after >= self.end):
+            self.compute(after)
+
+        index = bisect.bisect_right(self.instants, after)
+
+        # the next instant may lie past the horizon, a horizon starting at after covers a full week.
+        if (index == len(self.instants) and self.start != after):
+            self.compute(after)
+            index = bisect.bisect_right(self.instants, after)
+
+        if (index == len(self.instants)):
+            return None
+
+        return self.instants[index]
+
+    """
+    precompute fire instants of the horizon starting at after.
+
+    @param after int unix time seconds.
+    """
+    def compute(self, after):
+        self.start = after
+        self.end = after + self.__class__.horizon_days * MINUTES_PER_DAY * 60
+        self.instants = get_fire_instants(self.schedule, self.zone, self.start, self.end)
+
+"""
+return utc fire instants of schedule in range.
+
+local times skipped by a DST transition do not fire,
+local times repeated by a DST transition fire once on the first occurrence.
+
+@param schedule WeeklySchedule (required)schedule on local time.
+@param zone pytz timezone (required)local time zone.
+@param start int unix time seconds, exclusive.
+@param end int unix time seconds, inclusive.
+@return list[int] sorted unix time seconds.
+"""
+def get_fire_instants(schedule, zone, start, end):
+    instants = []
+
+    if (schedule.bits == 0):
+        return instants
+
+    day = datetime.fromtimestamp(start, tz=zone).date() - timedelta(days=1)
+    last_day = datetime.fromtimestamp(end, tz=zone).date() + timedelta(days=1)
+
+    while (day <= last_day):
+        bits = (schedule.bits >> (day.weekday() * MINUTES_PER_DAY)) & DAY_MASK
+
+        if (bits != 0):
+            instants.extend(get_day_instants(zone, datetime(day.year, day.month, day.day), bits))
+
+        day += timedelta(days=1)
+
+    return [instant for instant in sorted(instants) if start < instant <= end]
+
+"""
+return utc fire instants of a local day.
+
+the utc offset is resolved at the start and the end of the day, minutes are shifted
+by the offset before or after the DST transition of the day if any.
+
+@param zone pytz timezone
+@param midnight datetime.datetime naive local midnight.
+@param bits int minute-of-day bitmask.
+@return list[int] unix time seconds.
+"""
+def get_day_instants(zone, midnight, bits):
+    try:
+        first = int(zone.localize(midnight, is_dst=None).timestamp())
+        last = int(zone.localize(midnight + timedelta(minutes=MINUTES_PER_DAY - 1), is_dst=None).timestamp())
+    except (AmbiguousTimeError, NonExistentTimeError):
+        # a transition at midnight, rare enough to resolve every minute.
+        return get_localized_instants(zone, midnight, bits)
+
+    instants = []
+    after = last - (MINUTES_PER_DAY - 1) * 60
+
+    if (after == first):
+        while (bits != 0):
+            minute = lowest_bit(bits)
+            bits &= bits - 1
+            instants.append(first + minute * 60)
+
+        return instants
+
+    transition = find_transition(zone, first, last)
+
+    while (bits != 0):
+        minute = lowest_bit(bits)
+        bits &= bits - 1
+
+        # before the transition, or the first occurrence of a repeated time.
+        if (first + minute * 60 < transition):
+            instants.append(first + minute * 60)
+        # after the transition, otherwise the time is skipped.
+        elif (after + minute * 60 >= transition):
+            instants.append(after + minute * 60)
+
+    return instants
+
+"""
+return first instant with the utc offset of high.
+
+@param zone pytz timezone
+@param low int unix time seconds.
+@param high int unix time seconds with other utc offset than low.
+@return int unix time seconds.
+"""
+def find_transition(zone, low, high):
+    offset = datetime.fromtimestamp(low, tz=zone).utcoffset()
+
+    while (high - low > 1):
+        middle = (low + high) // 2
+
+        if (datetime.fromtimestamp(middle, tz=zone).utcoffset() == offset):
+            low = middle
+        else:
+            high = middle
+
+    return high
+
+"""
+return utc fire instants of a local day, localizing every minute.
+
+@param zone pytz timezone
+@param midnight datetime.datetime naive local midnight.
+@param bits int minute-of-day bitmask.
+@return list[int] unix time seconds.
+"""
+def get_localized_instants(zone, midnight, bits):
+    instants = []
+
+    while (bits != 0):
+        minute = lowest_bit(bits)
+        bits &= bits - 1
+
+        try:
+            local = zone.localize(midnight + timedelta(minutes=minute), is_dst=None)
+        except NonExistentTimeError:
+            continue
+        except AmbiguousTimeError:
+            local = zone.localize(midnight + timedelta(minutes=minute), is_dst=True)
+
+        instants.append(int(local.timestamp()))
+
+    return instants
+
+"""
+return whether all minutes of bitmask are active on schedule.
+
+@param bits int minute-of-week bitmask.
+@param schedule WeeklySchedule or None.
+@return bool
+"""
+def is_covered(bits, schedule):
+    return schedule is not None and bits & ~schedule.bits == 0
+
+"""
+return index of lowest set bit.
+
+@param bits int non zero.
+@return int
+"""
+def lowest_bit(bits):
+    return (bits & -bits).bit_length() - 1
+
+"""
+return minute of week.
+
+@param now datetime.datetime
+@return int
+"""
+def minute_of_week(now):
+    return now.weekday() * MINUTES_PER_DAY + now.hour * 60 + now.minute
+
+"""
+parse time string to minute of day.
+
+@param time string format: [%H:%M].
+@return int or None if invalid.
+"""
+def parse_time(time):
+    try:
+        parsed = datetime.strptime(time, '%H:%M')
+    except ValueError:
+        return None
+
+    return parsed.hour * 60 + parsed.minute
+
+"""
+format minute of day.
+
+@param minute int minute of day.
+@return string format: [%H:%M].
+"""
+def format_time(minute):
+    return '%02d:%02d' % (minute // 60, minute % 60)
+
+"""
+parse weekday name or its three letter abbreviation to weekday index.
+
+@param name string e.g. "Monday", "mon".
+@return int Monday is 0, or None if invalid.
+"""
+def parse_weekday_name(name):
+    for index, weekday in enumerate(WEEKDAY_NAMES):
+        if (name.lower() in (weekday.lower(), weekday[:3].lower())):
+            return index
+
+    return None
+
+"""
+parse a field of schedule expression.
+
+a field is a comma separated list of "*", "<a>" or "<a>-<b>", each optionally
+followed by "/<step>". weekday ranges may wrap around the week, e.g. "Sat-Mon".
+
+@param field string e.g. "*/30", "00-04", "Mon-Fri".
+@param low int lowest value.
+@param high int highest value.
+@param weekday bool values are weekday names.
+@return list[int] sorted values or None if invalid.
+"""
+def parse_field(field, low, high, weekday=False):
+    values = set()
+
+    for part in field.split(','):
+        base, slash, step = part.partition('/')
+
+        if (slash != ''):
+            if (not step.isdigit() or int(step) < 1):
+                return None
+            step = int(step)
+        else:
+            step = 1
+
+        if (base == '*'):
+            first, last = low, high
+        else:
+            first, dash, last = base.partition('-')
+            first = parse_field_value(first, low, high, weekday)
+            last = parse_field_value(last, low, high, weekday) if dash != '' else (high if slash != '' else first)
+
+            if (first is None or last is None):
+                return None
+
+        if (first > last and not weekday):
+            return None
+
+        count = (last - first) % (high - low + 1) + 1
+        values.update(low + (first - low + offset) % (high - low + 1) for offset in range(0, count, step))
+
+    return sorted(values)
+
+"""
+parse a value of schedule expression field.
+
+@param value string number, or weekday name if weekday.
+@param low int lowest value.
+@param high int highest value.
+@param weekday bool value is weekday name.
+@return int or None if invalid.
+"""
+def parse_field_value(value, low, high, weekday):
+    if (weekday):
+        return parse_weekday_name(value)
+
+    if (not value.isdigit() or not low <= int(value) <= high):
+        return None
+
+    return int(value)
+
+"""
+normalize a field of schedule expression, numbers are zero padded and weekdays abbreviated.
+
+@param field string valid field, e.g. "0-4/2", "mon-friday".
+@param weekday bool values are weekday names.
+@return string e.g. "00-04/2", "Mon-Fri".
+"""
+def normalize_field(field, weekday=False):
+    parts = []
+
+    for part in field.split(','):
+        base, slash, step = part.partition('/')
+
+        if (base != '*'):
+            if (weekday):
+                base = '-'.join(WEEKDAY_NAMES[parse_weekday_name(value)][:3] for value in base.split('-'))
+            else:
+                base = '-'.join('%02d' % (int(value)) for value in base.split('-'))
+
+        parts.append(base + ('/%d' % (int(step)) if slash != '' else ''))
+
+    return ','.join(parts)
+
+"""
+compile schedule expression to minute-of-week bitmask.
+
+accepted forms:
+    "<HH:MM>"                           every day at time, e.g. "00:45".
+    "<weekday> <HH:MM>"                 weekday name or abbreviation at time, e.g. "Sunday 01:00", "Sun 01:00".
+    "<weekdays>"                        whole weekdays, e.g. "Sat,Sun".
+    "<minutes> <hours> [<weekdays>]"    cron like fields, e.g. "*/30 00-04 Mon-Fri".
+
+expressions of the same time are normalized the same, e.g. "0 0", "00 00" and "00:00".
+results are cached, so the same expression is compiled once per process.
+
+@param expression string
+@return tuple(string normalized expression, int bitmask) or None if invalid.
+"""
+@functools.lru_cache(maxsize=1024)
+def compile_expression(expression):
+    tokens = expression.split()
+
+    if (len(tokens) == 1 and parse_time(tokens[0]) is not None):
+        minute = parse_time(tokens[0])
+
+        return format_time(minute), DAILY_MASK << minute
+
+    if (len(tokens) == 2 and parse_weekday_name(tokens[0]) is not None and parse_time(tokens[1]) is not None):
+        weekday = parse_weekday_name(tokens[0])
+        minute = parse_time(tokens[1])
+
+        return '%s %s' % (WEEKDAY_NAMES[weekday], format_time(minute)), 1 << (weekday * MINUTES_PER_DAY + minute)
+
+    if (len(tokens) == 1):
+        tokens = ['*', '*', tokens[0]]
+
+    if (len(tokens) == 2):
+        tokens.append('*')
+
+    if (len(tokens) != 3):
+        return None
+
+    minutes = parse_field(tokens[0], 0, 59)
+    hours = parse_field(tokens[1], 0, 23)
+    weekdays = parse_field(tokens[2], 0, 6, weekday=True)
+
+    if (minutes is None or hours is None or weekdays is None):
+        return None
+
+    day_bits = 0
+    for hour in hours:
+        for minute in minutes:
+            day_bits |= 1 << (hour * 60 + minute)
+
+    bits = 0
+    for weekday in weekdays:
+        bits |= day_bits << (weekday * MINUTES_PER_DAY)
+
+    fields = [normalize_field(tokens[0]), normalize_field(tokens[1]), normalize_field(tokens[2], weekday=True)]
+
+    if (fields[:2] == ['*', '*']):
+        return fields[2], bits
+
+    if (fields[0].isdigit() and fields[1].isdigit()):
+        time = format_time(hours[0] * 60 + minutes[0])
+
+        if (fields[2] == '*'):
+            return time, bits
+
+        if (fields[2].isalpha()):
+            return '%s %s' % (WEEKDAY_NAMES[weekdays[0]], time), bits
+
+    return ' '.join(fields[:2] + ([fields[2]] if fields[2] != '*' else [])), bits
+
+"""
+compile schedule expressions into one schedule.
+
+@param expressions list[string]
+@return tuple(WeeklySchedule, list[string] sorted normalized expressions, list[string] invalid expressions)
+"""
+def compile_expressions(expressions):
+    schedule = WeeklySchedule()
+    normalized = set()
+    invalid = []
+
+    for expression in expressions:
+        compiled = compile_expression(expression)
+
+        if (compiled is None):
+            invalid.append(expression)
+            continue
+
+        normalized.add(compiled[0])
+        schedule.update(compiled[1])
+
+    return schedule, sorted(normalized), invalid
+
+"""
+format execution and exclude expressions as lines for export.
+
+@param execution_list list[string]
+@param exclude_list list[string]
+@return list[string] format: [execute <expression>] or [exclude <expression>].
+"""
+def export_expressions(execution_list, exclude_list):
+    return ['execute %s' % (expression) for expression in execution_list] + ['exclude %s' % (expression) for expression in exclude_list]
+
+"""
+parse exported lines to execution and exclude expressions.
+
+empty lines and code block fences are skipped.
+
+@param text string
+@return tuple(list[string] execution, list[string] exclude, list[string] invalid lines)
+"""
+def import_expressions(text):
+    execution_list = []
+    exclude_list = []
+    invalid = []
+
+    for line in text.splitlines():
+        line = line.strip()
+
+        if (line == '' or line.startswith('```')):
+            continue
+
+        kind, _, expression = line.partition(' ')
+
+        if (kind not in ('execute', 'exclude') or compile_expression(expression) is None):
+            invalid.append(line)
+            continue
+
+        (execution_list if kind == 'execute' else exclude_list).append(expression)
+
+    return execution_list, exclude_list, invalid
@@ -0,0 +1,186 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+"""
+timer scheduler that sleeps until the next due event.
+
+events are kept in a min-heap of fire times in unix time seconds.
+replaced or removed events are left in the heap and skipped when popped.
+"""
+class Scheduler():
+
+    """
+    max seconds to sleep at once, for following wall clock adjustments.
+    """
+    max_sleep_seconds = 3600
+
+    """
+    constructor.
+
+    @param logger Logger (required)utils.Logger instance.
+    """
+    def __init__(self, logger):
+        self.logger = logger
+        self.heap = []
+        self.entries = {}
+        self.counter = itertools.count()
+        self.changed = None
+        self.task = None
+        self.running_tasks = set()
+
+    """
+    schedule event, replacing the event of same key.
+
+    @param key hashable event key.
+    @param fire_at int (required)fire time in unix time seconds, None to unschedule.
+    """
+    def schedule(self, key, fire_at):
+        if (fire_at is None):
+            self.unschedule(key)
+            return
+
+        seq = next(self.counter)
+        self.entries[key] = (fire_at, seq)
+        heapq.heappush(self.heap, (fire_at, seq, key))
+        self.notify_changed()
+
+    """
+    unschedule event.
+
+    @param key hashable event key.
+    """
+    def unschedule(self, key):
+        if (self.entries.pop(key, None) is not None):
+            self.notify_changed()
+
+    """
+    return scheduled fire time.
+
+    @param key hashable event key.
+    @return int or None
+    """
+    def get(self, key):
+        entry = self.entries.get(key)
+
+        if (entry is None):
+            return None
+
+        return entry[0]
+
+    """
+    return next valid heap item.
+
+    @return tuple(int, int, key) or None
+    """
+    def peek(self):
+        while (len(self.heap) > 0):
+            fire_at, seq, key = self.heap[0]
+
+            if (self.entries.get(key) == (fire_at, seq)):
+                return self.heap[0]
+
+            heapq.heappop(self.heap)
+
+        return None
+
+    """
+    pop all events due at now.
+
+    @param now float unix time seconds.
+    @return list[tuple(key, int)]
+    """
+    def pop_due(self, now):
+        due = []
+
+        while (True):
+            item = self.peek()
+
+            if (item is None or item[0] > now):
+                break
+
+            fire_at, seq, key = heapq.heappop(self.heap)
+            del self.entries[key]
+            due.append((key, fire_at))
+
+        return due
+
+    """
+    wake up the loop to re-evaluate the next due event.
+    """
+    def notify_changed(self):
+        if (self.changed is not None):
+            self.changed.set()
+
+    """
+    start scheduler loop.
+
+    @param callback coroutine function (required)called with list of due (key, fire_at).
+    """
+    def start(self, callback):
+        if (self.task is not None and not self.task.done()):
+            return
+
+        self.changed = asyncio.Event()
+        self.task = asyncio.ensure_future(self.loop(callback))
+
+    """
+    stop scheduler loop.
+    """
+    def stop(self):
+        if (self.task is not None):
+            self.task.cancel()
+            self.task = None
+
+    """
+    scheduler loop.
+
+    @param callback coroutine function (required)called with list of due (key, fire_at).
+    """
+    async def loop(self, callback):
+        while (True):
+            self.changed.clear()
+            item = self.peek()
+
+            if (item is not None):
+                now = time.time()
+                due = self.pop_due(now)
+
+                if (len(due) > 0):
+                    self.dispatch(callback, due)
+                    continue
+
+                timeout = min(item[0] - now, self.__class__.max_sleep_seconds)
+            else:
+                timeout = None
+
+            try:
+                await asyncio.wait_for(self.changed.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    """
+    run callback without blocking scheduler loop.
+
+    @param callback coroutine function
+    @param due list[tuple(key, int)]
+    """
+    def dispatch(self, callback, due):
+        task = asyncio.ensure_future(callback(due))
+        self.running_tasks.add(task)
+        task.add_done_callback(self.on_dispatched)
+
+    """
+    exec when dispatched callback finished.
+
+    @param task asyncio.Task
+    """
+    def on_dispatched(self, task):
+        self.running_tasks.discard(task)
+
+        if (task.cancelled()):
+            return
+
+        if (task.exception() is not None):
+            self.logger.error('scheduled task failed: %s' % (repr(task.exception())))
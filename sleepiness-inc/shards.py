@@ -0,0 +1,99 @@
+import os
+import signal
+import subprocess
+import sys
+
+from utils import Logger
+
+"""
+launch SleepinessInc shards as separate processes on one host.
+
+SHARD_COUNT shards are split into SHARD_PROCESSES contiguous ranges,
+and each range runs as sleepiness-inc.py with its own SHARD_IDS.
+
+METRICS_PORT is the port of the first process, the others serve on the following ports.
+all processes share the sqlite file of STATE_DB_PATH, so guild state is kept when
+guilds move between processes, writes wait for the lock of other processes.
+
+usage: SHARD_COUNT=8 SHARD_PROCESSES=2 python shards.py
+"""
+
+"""
+split shards into contiguous ranges.
+
+@param shard_count int total number of shards.
+@param processes int number of processes.
+@return list[string] SHARD_IDS per process, format: [0-3].
+"""
+def split_shard_ids(shard_count, processes):
+    processes = max(1, min(processes, shard_count))
+    size, rest = divmod(shard_count, processes)
+    ranges = []
+    first = 0
+
+    for index in range(processes):
+        last = first + size + (1 if index < rest else 0) - 1
+        ranges.append('%d-%d' % (first, last))
+        first = last + 1
+
+    return ranges
+
+"""
+return environment of a shard process.
+
+@param environ dict{string: string} environment of launcher.
+@param shard_count int total number of shards.
+@param shard_ids string SHARD_IDS of process.
+@param index int index of process.
+@return dict{string: string}
+"""
+def get_process_env(environ, shard_count, shard_ids, index):
+    env = dict(environ, SHARD_COUNT=str(shard_count), SHARD_IDS=shard_ids)
+
+    if (environ.get('METRICS_PORT', '') != ''):
+        env['METRICS_PORT'] = str(int(environ['METRICS_PORT']) + index)
+
+    return env
+
+"""
+run shard processes until all of them exit.
+
+@param shard_count int total number of shards.
+@param processes int number of processes.
+@param logger Logger
+@return int exit code.
+"""
+def run(shard_count, processes, logger):
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sleepiness-inc.py')
+    children = []
+
+    for index, shard_ids in enumerate(split_shard_ids(shard_count, processes)):
+        env = get_process_env(os.environ, shard_count, shard_ids, index)
+        logger.info('launching shards %s/%s.' % (shard_ids, shard_count))
+        children.append((shard_ids, subprocess.Popen([sys.executable, script], env=env)))
+
+    def terminate(signum, frame):
+        for shard_ids, child in children:
+            if (child.poll() is None):
+                child.send_signal(signum)
+
+    signal.signal(signal.SIGTERM, terminate)
+    signal.signal(signal.SIGINT, terminate)
+
+    code = 0
+    for shard_ids, child in children:
+        returncode = child.wait()
+        logger.info('shards %s exited with %s.' % (shard_ids, returncode))
+
+        if (returncode != 0):
+            code = 1
+
+    return code
+
+if __name__ == '__main__':
+    logger = Logger(os.environ.get('LOG_LEVEL', 'INFO'))
+
+    if (not os.environ.get('SHARD_COUNT')):
+        raise Exception('SHARD_COUNT is required.')
+
+    sys.exit(run(int(os.environ['SHARD_COUNT']), int(os.environ.get('SHARD_PROCESSES', '1')), logger))
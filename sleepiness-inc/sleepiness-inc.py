@@ -1,13 +1,17 @@
+import asyncio
 import os
-import time
 import textwrap
 
-from datetime import timedelta
+from datetime import datetime, timedelta
+from time import perf_counter
 
-from discord import Client, MemberCacheFlags, Intents, Status
-from discord.ext import tasks
+from discord import Client, AutoShardedClient, MemberCacheFlags, Intents, Status
+from pytz import UnknownTimeZoneError
 
-from utils import Logger, DateTime
+from schedule import FireInstants, get_fire_instants, minute_of_week, is_covered, compile_expression, compile_expressions, export_expressions, import_expressions
+from scheduler import Scheduler
+from store import Store
+from utils import Logger, DateTime, FanOut, ChannelIndex, VoiceIndex, ExemptionIndex, Lifecycle, RestScheduler, Metrics, PRIORITY_DISCONNECT, PRIORITY_REPLY, PRIORITY_NOTIFY, PRIORITY_PRESENCE, PRIORITY_GREETING
 
 """
 SleepinessInc is a discord bot that force disconnect all users in voice channel on weekday midnight.
@@ -15,8 +19,8 @@ SleepinessInc is a discord bot that force disconnect all users in voice channel
 class SleepinessInc(Client):
 
     """
-    exec disconnect time list.
-    format: [HH:MM]. 
+    exec disconnect schedule expressions.
+    format: [HH:MM], [%A HH:MM], [<weekdays>] or [<minutes> <hours> [<weekdays>]].
     """
     execution_time_list = [
         '00:00',
@@ -33,8 +37,8 @@ class SleepinessInc(Client):
     ]
 
     """
-    not exec disconnect time list.
-    format: [%A %H:%M]. 
+    not exec disconnect schedule expressions.
+    format: same as execution_time_list, e.g. [Sunday 01:00], [Sat,Sun].
     """
     exclude_time_list = []
 
@@ -49,21 +53,57 @@ class SleepinessInc(Client):
     ignore_channel_names = os.environ.get('IGNORE_CHANNEL_NAMES', '').split(',')
 
     """
-    last exection time for use checing duplicate call.
+    seconds between good night notice and force disconnect.
     """
-    last_executed_minute = None
+    grace_period_seconds = int(os.environ.get('GRACE_PERIOD_SECONDS', '10'))
+
+    """
+    max number of discord api calls running at the same time, the concurrency limit of fan out.
+    """
+    rest_concurrency = int(os.environ.get('REST_CONCURRENCY', '8'))
+
+    """
+    runtime profile.
+    full: request all intents and cache all members.
+    minimal: request only used intents and cache members on voice channels.
+    """
+    runtime_profile = os.environ.get('RUNTIME_PROFILE', 'full')
+
+    """
+    max length of a discord message.
+    """
+    message_length_limit = 2000
+
+    """
+    number of members listed by stats command.
+    """
+    stats_limit = int(os.environ.get('STATS_LIMIT', '10'))
+
+    """
+    state database file path.
+    """
+    state_db_path = os.environ.get('STATE_DB_PATH', 'sleepiness-inc.sqlite3')
+
+    """
+    seconds an execution may run late, missed executions within this window are caught up after restart.
+    """
+    catch_up_window_seconds = int(os.environ.get('CATCH_UP_WINDOW_SECONDS', '1800'))
+
+    """
+    metrics endpoint port, metrics are not served if empty.
+    """
+    metrics_port = os.environ.get('METRICS_PORT', '')
 
     """
     constructor.
 
     @param token string (required)discord token.
     @param logger Logger (optional)utils.Logger instance.
+    @param launch bool (optional)run a bot in constructor, False to start it later on a running loop.
+    @param options dict (optional)additional discord.Client options, e.g. connector.
     """
-    def __init__(self, token, logger=None):
-        super().__init__(
-            intents = Intents.all(),
-            member_cache_flags = MemberCacheFlags.all()
-        )
+    def __init__(self, token, logger=None, launch=True, **options):
+        super().__init__(**self.__class__.get_client_options(self.__class__.runtime_profile), **options)
 
         if (token is None):
             raise Exception('token is required.')
@@ -75,33 +115,258 @@ class SleepinessInc(Client):
         self.sleeping_list_per_guild = {}
         self.execution_time_list_per_guild = {}
         self.exclude_time_list_per_guild = {}
+        self.execution_schedule_per_guild = {}
+        self.exclude_schedule_per_guild = {}
+        self.last_execution_per_guild = {}
+        self.time_zone_per_guild = {}
+        self.fire_instants_per_guild = {}
+        self.next_execution_per_guild = {}
+        self.grace_period_timers_per_guild = {}
+        self.channel_index = ChannelIndex()
+        self.voice_index = VoiceIndex()
+        self.exemption_index = ExemptionIndex()
 
         if (self.logger is None):
             self.logger = Logger(os.environ.get('LOG_LEVEL', 'INFO'))
 
-        self.logger.info('Application starting.')
-        self.run(self.token)
+        self.fanout = FanOut(self.logger)
+        self.lifecycle = Lifecycle(self.logger)
+        self.rest = RestScheduler(self.__class__.rest_concurrency, self.logger)
+        self.schedulers = {}
+        self.metrics = Metrics('sleepiness_inc', self.logger)
+        self.watch_tick_seconds = self.metrics.histogram('watch_tick_seconds', 'duration of a watch tick.')
+        self.guild_disconnect_seconds = self.metrics.histogram('guild_disconnect_seconds', 'seconds from scheduled execution until disconnect of a guild finished.')
+        self.on_message_seconds = self.metrics.histogram('on_message_seconds', 'handling time of a received message.')
+        self.messages_sent_total = self.metrics.counter('messages_sent_total', 'sent messages.', ('priority',))
+        self.metrics.gauge('rest_queue_depth', 'queued discord api calls.').set_function(self.rest.get_queue_depth)
+        self.store = Store(self.__class__.state_db_path, self.logger)
+        self.load_state()
+
+        if (launch):
+            self.logger.info('Application starting.')
+            self.run(self.token)
 
     """
-    exec when launched a bot.
+    return discord.Client options of runtime profile.
+
+    @param profile string (required)runtime profile(full, minimal).
+    @return dict
+    """
+    @classmethod
+    def get_client_options(cls, profile):
+        if (profile == 'full'):
+            return {
+                'intents': Intents.all(),
+                'member_cache_flags': MemberCacheFlags.all(),
+            }
+
+        if (profile == 'minimal'):
+            intents = Intents(guilds=True, voice_states=True, guild_messages=True)
+
+            return {
+                'intents': intents,
+                'member_cache_flags': MemberCacheFlags.from_intents(intents),
+                'chunk_guilds_at_startup': False,
+            }
+
+        raise Exception('invalid runtime profile.')
+
+    """
+    exec when launched a bot, and again when a reconnect could not resume the session.
+    schedules and greetings are done once, indexes are rebuilt from the new gateway cache.
     """
     async def on_ready(self):
         self.logger.debug('on_ready')
 
-        await self.change_presence(status=Status.online)
+        if (self.lifecycle.ready()):
+            await self.start_metrics()
+
+        await self.set_presence(Status.online)
 
         for guild in self.guilds:
+            self.prepare_guild(guild)
+
+        await self.fanout.run([self.greet(guild) for guild in self.lifecycle.take_greetings(self.guilds)], 'greet')
+
+        for scheduler in self.schedulers.values():
+            scheduler.start(self.watch)
+
+    """
+    build indexes of guild and schedule its events if not scheduled yet.
+
+    @param guild discord.Guild
+    """
+    def prepare_guild(self, guild):
+        self.channel_index.build(guild)
+        self.voice_index.build(guild)
+        self.exemption_index.build(guild)
+
+        if (self.execution_schedule_per_guild.get(guild.id) is None):
             if (self.execution_time_list_per_guild.get(guild.id) is None):
-                self.execution_time_list_per_guild[guild.id] = self.__class__.execution_time_list
-            
+                self.execution_time_list_per_guild[guild.id] = list(self.__class__.execution_time_list)
+
             if (self.exclude_time_list_per_guild.get(guild.id) is None):
-                self.exclude_time_list_per_guild[guild.id] = self.__class__.exclude_time_list
-            
-            notify_channel = self.find_channel(guild, self.notify_channel_name)
-            if (notify_channel is not None):
-                await notify_channel.send('Hello everyone! I\'m ready.')
+                self.exclude_time_list_per_guild[guild.id] = list(self.__class__.exclude_time_list)
+
+            self.build_schedule(guild)
+
+        scheduler = self.get_scheduler(guild)
+
+        if (scheduler.get(('execute', guild.id)) is None):
+            self.restore_execution(guild)
+
+        if (self.sleeping_list_per_guild.get(guild.id) is not None and scheduler.get(('awake', guild.id)) is None):
+            scheduler.schedule(('awake', guild.id), int(self.sleeping_list_per_guild[guild.id].timestamp()))
+
+    """
+    schedule next execution from saved snapshot if still ahead, otherwise compute it with catch up.
+
+    @param guild discord.Guild (required)target guild.
+    """
+    def restore_execution(self, guild):
+        next_execution = self.next_execution_per_guild.pop(guild.id, None)
+
+        # nothing was due between the saved execution and now, so the snapshot is still the next one.
+        if (next_execution is not None and next_execution > DateTime.now().timestamp()):
+            self.get_scheduler(guild).schedule(('execute', guild.id), next_execution)
+            return
+
+        self.schedule_execution(guild, catch_up=True)
+
+    """
+    send greeting to notify channel of guild.
+
+    @param guild discord.Guild
+    """
+    async def greet(self, guild):
+        notify_channel = self.find_channel(guild, self.notify_channel_name)
+
+        if (notify_channel is not None):
+            await self.send(notify_channel, 'Hello everyone! I\'m ready.', PRIORITY_GREETING)
+
+    """
+    exec when joined a guild.
 
-        self.watch.start()
+    @param guild discord.Guild
+    """
+    async def on_guild_join(self, guild):
+        self.prepare_guild(guild)
+
+    """
+    exec when left a guild.
+
+    @param guild discord.Guild
+    """
+    async def on_guild_remove(self, guild):
+        self.channel_index.remove_guild(guild)
+        self.voice_index.remove_guild(guild)
+        self.exemption_index.remove_guild(guild)
+
+    """
+    exec when created a channel.
+
+    @param channel discord.abc.GuildChannel
+    """
+    async def on_guild_channel_create(self, channel):
+        self.channel_index.add(channel)
+
+    """
+    exec when deleted a channel.
+
+    @param channel discord.abc.GuildChannel
+    """
+    async def on_guild_channel_delete(self, channel):
+        self.channel_index.remove(channel)
+
+    """
+    exec when updated a channel.
+
+    @param before discord.abc.GuildChannel
+    @param after discord.abc.GuildChannel
+    """
+    async def on_guild_channel_update(self, before, after):
+        self.channel_index.update(before, after)
+
+    """
+    exec when changed voice state of member.
+
+    @param member discord.Member
+    @param before discord.VoiceState
+    @param after discord.VoiceState
+    """
+    async def on_voice_state_update(self, member, before, after):
+        self.voice_index.update(member, before, after)
+
+        if (after.channel is not None and before.channel is None):
+            self.exemption_index.update_member(member)
+
+    """
+    exec when a member joined a guild.
+
+    @param member discord.Member
+    """
+    async def on_member_join(self, member):
+        self.exemption_index.update_member(member)
+
+    """
+    exec when a member left a guild.
+
+    @param member discord.Member
+    """
+    async def on_member_remove(self, member):
+        self.exemption_index.discard_member(member)
+
+    """
+    exec when updated a member, keep exempted members current on role change.
+
+    @param before discord.Member
+    @param after discord.Member
+    """
+    async def on_member_update(self, before, after):
+        if (before.roles != after.roles):
+            self.exemption_index.update_member(after)
+
+    """
+    exec when deleted a role, stop exempting the role.
+
+    @param role discord.Role
+    """
+    async def on_guild_role_delete(self, role):
+        if (self.exemption_index.remove_role(role.guild, role)):
+            self.save_state(role.guild)
+
+    """
+    exec when resumed a session, check voice index missed no event while reconnecting.
+    """
+    async def on_resumed(self):
+        self.logger.debug('on_resumed')
+
+        for guild in self.guilds:
+            if (not self.voice_index.verify(guild)):
+                self.logger.info('voice index rebuilt for inconsistency on %s.' % (guild.name))
+
+    """
+    exec when closing a bot.
+    """
+    async def close(self):
+        await super().close()
+        await self.metrics.stop()
+        self.rest.stop()
+
+        # the last flush may wait for disk and locks of other processes, keep the loop free for other bots.
+        await asyncio.to_thread(self.store.close)
+
+    """
+    start metrics endpoint if metrics port is set.
+    """
+    async def start_metrics(self):
+        if (self.__class__.metrics_port == ''):
+            return
+
+        try:
+            await self.metrics.start(int(self.__class__.metrics_port))
+        except Exception as e:
+            self.logger.error('failed to start metrics: %s' % (repr(e)))
 
     """
     exec when received an message.
@@ -111,6 +376,19 @@ class SleepinessInc(Client):
     async def on_message(self, message):
         self.logger.debug('on_message')
 
+        started = perf_counter()
+
+        try:
+            await self.handle_message(message)
+        finally:
+            self.on_message_seconds.observe(perf_counter() - started)
+
+    """
+    handle received message.
+
+    @param message discord.Message
+    """
+    async def handle_message(self, message):
         if (self.find_user_from_list(message.mentions, self.user.name) is None):
             return
 
@@ -125,57 +403,57 @@ class SleepinessInc(Client):
     @param message discord.Message
     """
     async def command(self, message):
-        now = DateTime.now()
         commands = message.content.split(' ')
         guild = message.guild
         channel = message.channel
+        now = DateTime.now().astimezone(self.get_zone(guild))
 
         if (commands is None or len(commands) < 2):
             return
         
         if (commands[1] == 'run'):
-            for voice_channel in guild.voice_channels:
-                await self.disconnect(guild, voice_channel, now)
+            await self.disconnect_guild(guild, now)
             return
         
         if (commands[1] == 'add'):
             if (len(commands) < 3):
-                await channel.send('time is required.')
+                await self.send(channel, 'time is required.')
                 return
 
-            await self.do_add(commands[2], guild, channel)
+            await self.do_add(' '.join(commands[2:]), guild, channel)
             return
         
         if (commands[1] == 'remove'):
             if (len(commands) < 3):
-                await channel.send('time is required.')
+                await self.send(channel, 'time is required.')
                 return
 
-            await self.do_remove(commands[2], guild, channel)
+            await self.do_remove(' '.join(commands[2:]), guild, channel)
             return
         
         if (commands[1] == 'exclude'):
             if (len(commands) < 3):
-                await channel.send('weekday is required.')
-                return
-
-            if (len(commands) < 4):
-                await channel.send('time is required.')
+                await self.send(channel, 'exclude time is required.')
                 return
 
-            await self.do_exclude(commands[2], commands[3], guild, channel)
+            await self.do_exclude(' '.join(commands[2:]), guild, channel)
             return
         
         if (commands[1] == 'include'):
             if (len(commands) < 3):
-                await channel.send('weekday is required.')
+                await self.send(channel, 'exclude time is required.')
                 return
 
-            if (len(commands) < 4):
-                await channel.send('time is required.')
-                return
+            await self.do_include(' '.join(commands[2:]), guild, channel)
+            return
+
+        if (commands[1].split('\n')[0] == 'import'):
+            parts = message.content.split(None, 2)
+            await self.do_import(parts[2] if len(parts) >= 3 else '', guild, channel)
+            return
 
-            await self.do_include(commands[2], commands[3], guild, channel)
+        if (commands[1] == 'export'):
+            await self.do_export(guild, channel)
             return
         
         if (commands[1] == 'list'):
@@ -184,7 +462,7 @@ class SleepinessInc(Client):
         
         if (commands[1] == 'sleep'):
             if (len(commands) < 3):
-                await channel.send('minutes is required.')
+                await self.send(channel, 'minutes is required.')
                 return
 
             await self.do_sleep(int(commands[2]), guild, channel)
@@ -198,76 +476,427 @@ class SleepinessInc(Client):
             await self.do_status(guild, channel)
             return
 
+        if (commands[1] in ('exempt', 'unexempt')):
+            if (len(commands) < 3):
+                await self.do_exempt_list(guild, channel)
+                return
+
+            if (commands[2] not in ('role', 'member') or len(commands) < 4):
+                await self.send(channel, 'role or member name is required.')
+                return
+
+            await self.do_exempt(commands[1] == 'exempt', commands[2], ' '.join(commands[3:]), guild, channel)
+            return
+
+        if (commands[1] == 'stats'):
+            kind = commands[2] if len(commands) >= 3 else 'disconnect'
+            month = commands[3] if len(commands) >= 4 else now.strftime('%Y-%m')
+            await self.do_stats(kind, month, guild, channel)
+            return
+
+        if (commands[1] == 'timezone'):
+            await self.do_timezone(commands[2] if len(commands) >= 3 else None, guild, channel)
+            return
+
         await self.do_help(channel)
 
     """
-    check voice channel and force disconnect users.
+    check voice channel and force disconnect users, called by scheduler when events are due.
+
+    @param due list[tuple(key, int)] due scheduler events, fire time in unix time seconds.
     """
-    @tasks.loop(seconds=50)
-    async def watch(self):
+    async def watch(self, due):
+        started = perf_counter()
         now = DateTime.now()
+        unix_now = int(now.timestamp())
         self.logger.debug('started execution disconnect at %s.' % (now))
 
-        if (self.last_executed_minute == now.minute):
-            self.logger.debug('skip process for duplicated call.')
-            return
-        self.last_executed_minute = now.minute
+        awake_guilds = []
+        execution_jobs = []
 
-        await self.check_awake(self.guilds, now)
+        for (kind, guild_id), fire_at in due:
+            guild = self.get_guild(guild_id)
 
-        for guild in self.guilds:
-            self.logger.debug('guild: %s.' % (guild.name))
+            if (guild is None):
+                continue
 
-            if (not await self.is_executable(guild, now)):
+            if (kind == 'awake'):
+                awake_guilds.append(guild)
                 continue
 
-            for voice_channel in guild.voice_channels:
-                self.logger.debug('voice_channel: %s.' % (voice_channel.name))
-                await self.disconnect(guild, voice_channel, now)
+            self.schedule_execution(guild, fire_at)
+
+            if (not self.mark_executed(guild, fire_at, unix_now)):
+                continue
+
+            execution_jobs.append(self.execute(guild, datetime.fromtimestamp(fire_at, tz=self.get_zone(guild))))
+
+        await self.check_awake(awake_guilds, now)
+
+        await self.fanout.run(execution_jobs, 'execute')
         
+        self.watch_tick_seconds.observe(perf_counter() - started)
         self.logger.debug('finished execution disconnect at %s.' % (now))
 
     """
-    force disconnect all users on voice_channel
+    schedule next execution of guild.
+
+    @param guild discord.Guild (required)target guild.
+    @param after int (optional)schedule execution after this unix time seconds, now if omitted.
+    @param catch_up bool (optional)schedule missed execution within catch up window instead if any.
+    """
+    def schedule_execution(self, guild, after=None, catch_up=False):
+        if (after is None):
+            after = int(DateTime.now().timestamp())
+
+        fire_at = self.get_missed_execution_time(guild, after) if catch_up else None
+
+        if (fire_at is not None):
+            self.logger.info('catch up missed execution at %s on %s.' % (datetime.fromtimestamp(fire_at, tz=self.get_zone(guild)).isoformat(), guild.name))
+        else:
+            fire_at = self.get_next_execution_time(guild, after)
+
+        self.get_scheduler(guild).schedule(('execute', guild.id), fire_at)
+
+    """
+    record execution of guild as done, once per fire time.
+
+    @param guild discord.Guild (required)target guild.
+    @param fire_at int scheduled execution time in unix time seconds.
+    @param now int unix time seconds.
+    @return bool False if already executed or too late to execute.
+    """
+    def mark_executed(self, guild, fire_at, now):
+        last_execution = self.last_execution_per_guild.get(guild.id)
+
+        if (last_execution is not None and fire_at <= last_execution):
+            self.logger.info('already executed at %s on %s.' % (fire_at, guild.name))
+            return False
+
+        if (now - fire_at > max(self.__class__.catch_up_window_seconds, 60)):
+            self.logger.info('skip execution at %s out of catch up window on %s.' % (fire_at, guild.name))
+            return False
+
+        self.last_execution_per_guild[guild.id] = fire_at
+        self.save_state(guild)
+
+        return True
+
+    """
+    return latest execution time of guild missed since last execution within catch up window.
+
+    @param guild discord.Guild (required)target guild.
+    @param now int unix time seconds.
+    @return int unix time seconds or None
+    """
+    def get_missed_execution_time(self, guild, now):
+        schedule = self.execution_schedule_per_guild.get(guild.id)
+        last_execution = self.last_execution_per_guild.get(guild.id)
+
+        if (schedule is None or last_execution is None):
+            return None
+
+        instants = get_fire_instants(schedule, self.get_zone(guild), max(last_execution, now - self.__class__.catch_up_window_seconds), now)
+
+        if (len(instants) == 0):
+            return None
+
+        return instants[-1]
+
+    """
+    return scheduler of the shard owning guild.
+
+    @param guild discord.Guild (required)target guild.
+    @return Scheduler
+    """
+    def get_scheduler(self, guild):
+        scheduler = self.schedulers.get(guild.shard_id)
+
+        if (scheduler is None):
+            scheduler = Scheduler(self.logger)
+            self.schedulers[guild.shard_id] = scheduler
+
+            if (self.is_ready()):
+                scheduler.start(self.watch)
+
+        return scheduler
+
+    """
+    return next execution time of guild.
+
+    @param guild discord.Guild (required)target guild.
+    @param after int unix time seconds.
+    @return int unix time seconds or None
+    """
+    def get_next_execution_time(self, guild, after):
+        schedule = self.execution_schedule_per_guild.get(guild.id)
+
+        if (schedule is None):
+            return None
+
+        fire_instants = self.fire_instants_per_guild.get(guild.id)
+
+        if (fire_instants is None or fire_instants.schedule is not schedule):
+            fire_instants = FireInstants(schedule, self.get_zone(guild))
+            self.fire_instants_per_guild[guild.id] = fire_instants
+
+        return fire_instants.next(after)
+
+    """
+    drop precomputed fire instants of guild, call after changing schedule or time zone.
+
+    @param guild discord.Guild (required)target guild.
+    """
+    def reset_fire_instants(self, guild):
+        self.fire_instants_per_guild.pop(guild.id, None)
+
+    """
+    return time zone of guild.
+
+    @param guild discord.Guild target guild, default time zone if None.
+    @return pytz timezone
+    """
+    def get_zone(self, guild):
+        if (guild is None):
+            return DateTime.get_zone()
+
+        return DateTime.get_zone(self.time_zone_per_guild.get(guild.id))
+
+    """
+    build execution and exclude schedule of guild from schedule expressions.
+    expressions are compiled once into minute-of-week bitmaps, invalid entries are dropped and the others are normalized.
+
+    @param guild discord.Guild (required)target guild.
+    """
+    def build_schedule(self, guild):
+        execution_schedule, execution_time_list, invalid = compile_expressions(self.execution_time_list_per_guild.get(guild.id) or [])
+
+        for expression in invalid:
+            self.logger.error('invalid execution time %s on %s.' % (expression, guild.name))
+
+        exclude_schedule, exclude_time_list, invalid = compile_expressions(self.exclude_time_list_per_guild.get(guild.id) or [])
+
+        for expression in invalid:
+            self.logger.error('invalid exclude time %s on %s.' % (expression, guild.name))
+
+        self.execution_time_list_per_guild[guild.id] = execution_time_list
+        self.exclude_time_list_per_guild[guild.id] = exclude_time_list
+        self.execution_schedule_per_guild[guild.id] = execution_schedule
+        self.exclude_schedule_per_guild[guild.id] = exclude_schedule
+
+    """
+    force disconnect users on guild if executable.
+
+    @param guild discord.Guild (required)target guild.
+    @param now datetime.datetime
+    """
+    async def execute(self, guild, now):
+        self.logger.debug('guild: %s.' % (guild.name))
+
+        if (not await self.is_executable(guild, now)):
+            return
+
+        await self.disconnect_guild(guild, now)
+        self.guild_disconnect_seconds.observe((datetime.now(tz=now.tzinfo) - now).total_seconds())
+
+    """
+    force disconnect all users on all voice channels of guild at the same time.
 
     @param guild discord.Guild (required)target guild.
-    @param voice_channel discord.VoiceChannel (required)target voice channel.
     @param now datetime.datetime
     """
-    async def disconnect(self, guild, voice_channel, now):
-        disconnect_members = []
+    async def disconnect_guild(self, guild, now):
         notify_channel = self.find_channel(guild, self.notify_channel_name)
 
         if (notify_channel is None):
             self.logger.info('not found notify channel. channel_name = %s.' % (self.notify_channel_name))
             return
 
-        if (voice_channel.name in self.ignore_channel_names):
-            self.logger.info('ignore channel. channel_name = %s.' % (voice_channel.name))
-            return
+        voice_channels = []
 
-        if (len(voice_channel.members) == 0):
-            self.logger.debug('voice_channel.member is empty on %s.' % (voice_channel.name))
+        for channel_id in self.voice_index.get_channel_ids(guild):
+            voice_channel = guild.get_channel(channel_id)
 
-        for member in voice_channel.members:
-            display_name = self.get_user_display_name(member)
-            self.logger.debug('voice_channel.member %s on %s.'% (display_name, voice_channel.name))
-            disconnect_members.append(member)
+            if (voice_channel is None):
+                continue
 
-        if (len(disconnect_members) != 0):
-            await self.notify(notify_channel, 'good night.', disconnect_members)
+            if (voice_channel.name in self.ignore_channel_names):
+                self.logger.info('ignore channel. channel_name = %s.' % (voice_channel.name))
+                continue
 
-            time.sleep(10)
+            voice_channels.append(voice_channel)
 
-            if (await self.is_excludable(guild, now)):
-                message = 'It`s %s!\nHave a nice day!' % (now.strftime('%A'))
-                await self.notify(notify_channel, message, disconnect_members)
-                return
+        results = await self.fanout.run([self.get_voice_members(guild, voice_channel) for voice_channel in voice_channels], 'get members on %s' % (guild.name))
+        disconnect_channels = []
+        disconnect_members_per_channel = {}
 
-            for member in disconnect_members:
+        for voice_channel, members in zip(voice_channels, results):
+            if (isinstance(members, Exception) or len(members) == 0):
+                continue
+
+            for member in members:
                 display_name = self.get_user_display_name(member)
-                self.logger.info('found still connected user %s on %s. force disconnect.' % (display_name, voice_channel.name))
-                await member.edit(voice_channel=None)
+                self.logger.debug('voice_channel.member %s on %s.'% (display_name, voice_channel.name))
+
+            disconnect_channels.append(voice_channel)
+            disconnect_members_per_channel[voice_channel.id] = members
+
+        if (len(disconnect_channels) == 0):
+            return
+
+        disconnect_members = [member for voice_channel in disconnect_channels for member in disconnect_members_per_channel[voice_channel.id]]
+        await self.notify(notify_channel, 'good night.', disconnect_members)
+
+        results = await self.fanout.run([self.wait_grace_period(guild, voice_channel) for voice_channel in disconnect_channels], 'wait grace period on %s' % (guild.name))
+        disconnect_channels = [voice_channel for voice_channel, waited in zip(disconnect_channels, results) if waited is True]
+
+        if (len(disconnect_channels) == 0):
+            self.logger.info('grace period cancelled on %s.' % (guild.name))
+            return
+
+        if (await self.is_excludable(guild, now)):
+            message = 'It`s %s!\nHave a nice day!' % (now.strftime('%A'))
+            disconnect_members = [member for voice_channel in disconnect_channels for member in disconnect_members_per_channel[voice_channel.id]]
+
+            for voice_channel in disconnect_channels:
+                for member in disconnect_members_per_channel[voice_channel.id]:
+                    self.record_audit(guild, member, voice_channel, 'exclude')
+
+            await self.notify(notify_channel, message, disconnect_members)
+            return
+
+        await self.fanout.run([self.disconnect(guild, voice_channel) for voice_channel in disconnect_channels], 'disconnect on %s' % (guild.name))
+
+    """
+    force disconnect all users on voice_channel
+
+    @param guild discord.Guild (required)target guild.
+    @param voice_channel discord.VoiceChannel (required)target voice channel.
+    """
+    async def disconnect(self, guild, voice_channel):
+        jobs = [self.force_disconnect(member, voice_channel) for member in await self.get_voice_members(guild, voice_channel)]
+        await self.fanout.run(jobs, 'force disconnect on %s' % (voice_channel.name))
+
+    """
+    return members on voice channel, fetching members not in the member cache.
+
+    @param guild discord.Guild (required)target guild.
+    @param voice_channel discord.VoiceChannel (required)target voice channel.
+    @return list[discord.Member]
+    """
+    async def get_voice_members(self, guild, voice_channel):
+        members = {member_id: member for member_id, member in self.voice_index.get_members(guild, voice_channel).items() if not self.exemption_index.is_exempt(guild, member_id)}
+        unresolved_ids = [member_id for member_id, member in members.items() if member is None]
+
+        if (len(unresolved_ids) > 0):
+            jobs = [self.fetch_member(guild, member_id) for member_id in unresolved_ids]
+
+            for result in await self.fanout.run(jobs, 'fetch member on %s' % (voice_channel.name)):
+                if (isinstance(result, Exception)):
+                    continue
+
+                self.voice_index.set_member(guild, voice_channel, result)
+                self.exemption_index.update_member(result)
+
+                if (not self.exemption_index.is_exempt(guild, result.id)):
+                    members[result.id] = result
+
+        return [member for member in members.values() if member is not None]
+
+    """
+    force disconnect a member from voice channel.
+
+    @param member discord.Member (required)target member.
+    @param voice_channel discord.VoiceChannel (required)connected voice channel.
+    """
+    async def force_disconnect(self, member, voice_channel):
+        display_name = self.get_user_display_name(member)
+        self.logger.info('found still connected user %s on %s. force disconnect.' % (display_name, voice_channel.name))
+        await self.rest.submit(PRIORITY_DISCONNECT, 'member.edit:%s' % (member.guild.id), lambda: member.edit(voice_channel=None))
+        self.record_audit(member.guild, member, voice_channel, 'disconnect')
+
+    """
+    append event to audit log without waiting for disk.
+
+    @param guild discord.Guild (required)target guild.
+    @param member discord.Member (required)target member.
+    @param voice_channel discord.VoiceChannel (required)voice channel of member.
+    @param kind string (required)disconnect or exclude.
+    """
+    def record_audit(self, guild, member, voice_channel, kind):
+        now = DateTime.now().astimezone(self.get_zone(guild))
+        self.store.append(guild.id, member.id, voice_channel.id, kind, now.strftime('%Y-%m-%d'), int(now.timestamp()))
+
+    """
+    fetch member through rest scheduler.
+
+    @param guild discord.Guild (required)target guild.
+    @param member_id int
+    @return discord.Member
+    """
+    async def fetch_member(self, guild, member_id):
+        return await self.rest.submit(PRIORITY_DISCONNECT, 'member.fetch:%s' % (guild.id), lambda: guild.fetch_member(member_id))
+
+    """
+    send message through rest scheduler.
+
+    @param channel discord.abc.Messageable (required)target channel.
+    @param text string (required)message text.
+    @param priority int (optional)utils.PRIORITY_*.
+    @return discord.Message
+    """
+    async def send(self, channel, text, priority=PRIORITY_REPLY):
+        self.messages_sent_total.inc(1, (priority,))
+
+        return await self.rest.submit(priority, 'channel.send:%s' % (channel.id), lambda: channel.send(text))
+
+    """
+    change presence status through rest scheduler.
+
+    @param status discord.Status
+    """
+    async def set_presence(self, status):
+        await self.rest.submit(PRIORITY_PRESENCE, 'presence', lambda: self.change_presence(status=status))
+
+    """
+    wait grace period before force disconnect without blocking event loop.
+
+    @param guild discord.Guild (required)target guild.
+    @param voice_channel discord.VoiceChannel (required)target voice channel.
+    @return boolean False if cancelled.
+    """
+    async def wait_grace_period(self, guild, voice_channel):
+        timers = self.grace_period_timers_per_guild.setdefault(guild.id, {})
+
+        if (timers.get(voice_channel.id) is not None):
+            timers[voice_channel.id].cancel()
+
+        timer = asyncio.ensure_future(asyncio.sleep(self.grace_period_seconds))
+        timers[voice_channel.id] = timer
+
+        try:
+            await asyncio.wait({timer})
+        finally:
+            timer.cancel()
+
+            if (timers.get(voice_channel.id) is timer):
+                del timers[voice_channel.id]
+
+        return not timer.cancelled()
+
+    """
+    cancel all waiting grace periods on guild.
+
+    @param guild discord.Guild (required)target guild.
+    """
+    def cancel_grace_periods(self, guild):
+        timers = self.grace_period_timers_per_guild.get(guild.id)
+
+        if (timers is None):
+            return
+
+        for timer in list(timers.values()):
+            timer.cancel()
     
     """
     notify to users.
@@ -277,8 +906,6 @@ class SleepinessInc(Client):
     @param users list[discord.User] (optional)users list.
     """
     async def notify(self, channel, text, users = None):
-        message = ''
-
         if (channel is None):
             raise Exception('channel is None.')
             return
@@ -287,14 +914,91 @@ class SleepinessInc(Client):
             raise Exception('text is None.')
             return
 
-        if (users is not None):
-            for user in users:
-                message += '<@%s> ' % (user.id)
-            message += '\n'
+        for message in self.build_notify_messages(text, users):
+            await self.send(channel, message, PRIORITY_NOTIFY)
+
+    """
+    build notify messages, mentions are split into messages within message length limit.
+
+    @param text string notify text.
+    @param users list[discord.User] (optional)users list.
+    @return list[string]
+    """
+    def build_notify_messages(self, text, users = None):
+        if (users is None or len(users) == 0):
+            return [text]
+
+        limit = self.__class__.message_length_limit - len(' \n') - len(text)
+        messages = []
+        mentions = []
+        length = 0
+
+        for user in users:
+            mention = '<@%s>' % (user.id)
+
+            if (len(mentions) > 0 and length + 1 + len(mention) > limit):
+                messages.append('%s \n%s' % (' '.join(mentions), text))
+                mentions = []
+                length = 0
+
+            length += len(mention) if len(mentions) == 0 else 1 + len(mention)
+            mentions.append(mention)
+
+        messages.append('%s \n%s' % (' '.join(mentions), text))
+
+        return messages
+
+    """
+    load all guild state from store.
+    """
+    def load_state(self):
+        state_per_guild = self.store.load_all()
+
+        for guild_id, state in state_per_guild.items():
+            if (state.get('execution') is not None):
+                self.execution_time_list_per_guild[guild_id] = state['execution']
+
+            if (state.get('exclude') is not None):
+                self.exclude_time_list_per_guild[guild_id] = state['exclude']
+
+            if (state.get('sleeping') is not None):
+                self.sleeping_list_per_guild[guild_id] = datetime.fromisoformat(state['sleeping'])
+
+            if (isinstance(state.get('last_execution'), str)):
+                self.last_execution_per_guild[guild_id] = int(datetime.fromisoformat(state['last_execution']).timestamp())
+            elif (state.get('last_execution') is not None):
+                self.last_execution_per_guild[guild_id] = state['last_execution']
+
+            if (state.get('timezone') is not None):
+                self.time_zone_per_guild[guild_id] = state['timezone']
+
+            if (state.get('next_execution') is not None):
+                self.next_execution_per_guild[guild_id] = state['next_execution']
+
+            if (state.get('exempt_roles') is not None or state.get('exempt_members') is not None):
+                self.exemption_index.configure(guild_id, state.get('exempt_roles') or [], state.get('exempt_members') or [])
 
-        message += text
+        self.logger.info('loaded state of %s guilds.' % (len(state_per_guild)))
 
-        await channel.send(message)
+    """
+    save guild state to store without waiting for disk.
+
+    @param guild discord.Guild
+    """
+    def save_state(self, guild):
+        sleeping = self.sleeping_list_per_guild.get(guild.id)
+        execution_time_list = self.execution_time_list_per_guild.get(guild.id)
+        exclude_time_list = self.exclude_time_list_per_guild.get(guild.id)
+        last_execution = self.last_execution_per_guild.get(guild.id)
+
+        self.store.put(guild.id, 'execution', list(execution_time_list) if execution_time_list is not None else None)
+        self.store.put(guild.id, 'exclude', list(exclude_time_list) if exclude_time_list is not None else None)
+        self.store.put(guild.id, 'sleeping', sleeping.isoformat() if sleeping is not None else None)
+        self.store.put(guild.id, 'last_execution', last_execution)
+        self.store.put(guild.id, 'timezone', self.time_zone_per_guild.get(guild.id))
+        self.store.put(guild.id, 'next_execution', self.get_scheduler(guild).get(('execute', guild.id)))
+        self.store.put(guild.id, 'exempt_roles', self.exemption_index.get_role_ids(guild))
+        self.store.put(guild.id, 'exempt_members', self.exemption_index.get_member_ids(guild))
 
     """
     find channel by channel name from guild.
@@ -304,11 +1008,7 @@ class SleepinessInc(Client):
     @return discord.Channel or None
     """
     def find_channel(self, guild, name):
-        for channel in guild.channels:
-            if (channel.name == name):
-                return channel
-        
-        return None
+        return self.channel_index.find(guild, name)
 
     """
     find user by user name from user list.
@@ -321,6 +1021,21 @@ class SleepinessInc(Client):
             if (user.name == name):
                 return user
     
+    """
+    return display name of member id, member id if not cached.
+
+    @param guild discord.Guild
+    @param member_id int
+    @return string
+    """
+    def get_member_display_name(self, guild, member_id):
+        member = guild.get_member(member_id)
+
+        if (member is None):
+            return str(member_id)
+
+        return self.get_user_display_name(member)
+
     """
     return user guild name or account user name.
 
@@ -336,84 +1051,172 @@ class SleepinessInc(Client):
     """
     add to execution list.
 
-    @param time string add time string, format: [%H:%M].
+    @param expression string schedule expression, e.g. "00:45", "*/30 00-04 Mon-Fri".
     @param guild discord.Guild
     @param channel discord.Channel
     """
-    async def do_add(self, time, guild, channel):
-        if (self.execution_time_list_per_guild.get(guild.id) is None):
-            self.execution_time_list_per_guild[guild.id] = []
+    async def do_add(self, expression, guild, channel):
+        compiled = compile_expression(expression)
 
-        if (time in self.execution_time_list_per_guild[guild.id]):
-            await channel.send('time has allready added to execution time list.')
+        if (compiled is None):
+            await self.send(channel, 'time must be HH:MM or <minutes> <hours> [<weekdays>] format.')
             return
-        
-        self.execution_time_list_per_guild[guild.id].append(time)
-        self.execution_time_list_per_guild[guild.id].sort()
-        await channel.send('time has successfully added.')
+
+        execution_time_list = self.execution_time_list_per_guild.get(guild.id) or []
+
+        if (compiled[0] in execution_time_list or is_covered(compiled[1], self.execution_schedule_per_guild.get(guild.id))):
+            await self.send(channel, 'time has allready added to execution time list.')
+            return
+
+        self.execution_time_list_per_guild[guild.id] = sorted(execution_time_list + [compiled[0]])
+        self.build_schedule(guild)
+        self.reset_fire_instants(guild)
+        self.schedule_execution(guild)
+        self.save_state(guild)
+        await self.send(channel, 'time has successfully added.')
 
     """
     remove from execution list.
 
-    @param time string remove time string, format: [%H:%M].
+    @param expression string schedule expression, e.g. "01:00".
     @param guild discord.Guild
     @param channel discord.Channel
     """
-    async def do_remove(self, time, guild, channel):
-        if (self.execution_time_list_per_guild.get(guild.id) is None):
-            self.execution_time_list_per_guild[guild.id] = []
+    async def do_remove(self, expression, guild, channel):
+        compiled = compile_expression(expression)
 
-        if (not time in self.execution_time_list_per_guild[guild.id]):
-            await channel.send('time was not found in execution time list.')
+        if (compiled is None):
+            await self.send(channel, 'time must be HH:MM or <minutes> <hours> [<weekdays>] format.')
             return
-        
-        index = self.execution_time_list_per_guild[guild.id].index(time)
-        del self.execution_time_list_per_guild[guild.id][index]
-        await channel.send('time has successfully removed.')
+
+        execution_time_list = self.execution_time_list_per_guild.get(guild.id) or []
+
+        if (compiled[0] not in execution_time_list):
+            await self.send(channel, self.get_not_found_message('time was not found in execution time list.', compiled[1], execution_time_list))
+            return
+
+        self.execution_time_list_per_guild[guild.id] = [time for time in execution_time_list if time != compiled[0]]
+        self.build_schedule(guild)
+        self.reset_fire_instants(guild)
+        self.schedule_execution(guild)
+        self.save_state(guild)
+        await self.send(channel, 'time has successfully removed.')
 
     """
     add to exclude list.
 
-    @param weekday string format: [%A].
-    @param time string add time string, format: [%H:%M].
+    @param expression string schedule expression, e.g. "Sunday 01:00", "Sat,Sun".
     @param guild discord.Guild
     @param channel discord.Channel
     """
-    async def do_exclude(self, weekday, time, guild, channel):
-        exclude_time = '%s %s' % (weekday, time)
+    async def do_exclude(self, expression, guild, channel):
+        compiled = compile_expression(expression)
+
+        if (compiled is None):
+            await self.send(channel, 'exclude time must be %A %H:%M, <weekdays> or <minutes> <hours> [<weekdays>] format.')
+            return
 
-        if (self.exclude_time_list_per_guild.get(guild.id) is None):
-            self.exclude_time_list_per_guild[guild.id] = []
+        exclude_time_list = self.exclude_time_list_per_guild.get(guild.id) or []
 
-        if (exclude_time in self.exclude_time_list_per_guild[guild.id]):
-            await channel.send('exclude time has allready added to exclude time list.')
+        if (compiled[0] in exclude_time_list or is_covered(compiled[1], self.exclude_schedule_per_guild.get(guild.id))):
+            await self.send(channel, 'exclude time has allready added to exclude time list.')
             return
-        
-        self.exclude_time_list_per_guild[guild.id].append(exclude_time)
-        self.exclude_time_list_per_guild[guild.id].sort()
-        await channel.send('exclude time has successfully added.')
+
+        self.exclude_time_list_per_guild[guild.id] = sorted(exclude_time_list + [compiled[0]])
+        self.build_schedule(guild)
+        self.save_state(guild)
+        await self.send(channel, 'exclude time has successfully added.')
 
     """
     remove from exclude list.
 
-    @param weekday string format: [%A].
-    @param time string add time string, format: [%H:%M].
+    @param expression string schedule expression, e.g. "Monday 02:00".
+    @param guild discord.Guild
+    @param channel discord.Channel
+    """
+    async def do_include(self, expression, guild, channel):
+        compiled = compile_expression(expression)
+
+        if (compiled is None):
+            await self.send(channel, 'exclude time must be %A %H:%M, <weekdays> or <minutes> <hours> [<weekdays>] format.')
+            return
+
+        exclude_time_list = self.exclude_time_list_per_guild.get(guild.id) or []
+
+        if (compiled[0] not in exclude_time_list):
+            await self.send(channel, self.get_not_found_message('exclude time was not found in exclude time list.', compiled[1], exclude_time_list))
+            return
+
+        self.exclude_time_list_per_guild[guild.id] = [time for time in exclude_time_list if time != compiled[0]]
+        self.build_schedule(guild)
+        self.save_state(guild)
+        await self.send(channel, 'exclude time has successfully removed.')
+
+    """
+    return reply to removing an expression not in list, naming entries covering some of its minutes.
+
+    @param message string reply when no entry overlaps.
+    @param bits int minute-of-week bitmask of expression.
+    @param time_list list[string] normalized expressions.
+    @return string
+    """
+    def get_not_found_message(self, message, bits, time_list):
+        overlapping = [time for time in time_list if compile_expression(time)[1] & bits != 0]
+
+        if (len(overlapping) == 0):
+            return message
+
+        return '%s it is covered by %s, remove them and add the other times.' % (message, ', '.join('"%s"' % (time) for time in overlapping))
+
+    """
+    replace execution and exclude lists with exported lines.
+
+    @param text string lines, format: [execute <expression>] or [exclude <expression>].
     @param guild discord.Guild
     @param channel discord.Channel
     """
-    async def do_include(self, weekday, time, guild, channel):
-        exclude_time = '%s %s' % (weekday, time)
+    async def do_import(self, text, guild, channel):
+        execution_time_list, exclude_time_list, invalid = import_expressions(text)
 
-        if (self.exclude_time_list_per_guild.get(guild.id) is None):
-            self.exclude_time_list_per_guild[guild.id] = []
+        if (len(invalid) > 0):
+            await self.send(channel, 'invalid lines, nothing imported:\n%s' % ('\n'.join(invalid)))
+            return
 
-        if (not exclude_time in self.exclude_time_list_per_guild[guild.id]):
-            await channel.send('exclude time was not found in exclude time list.')
+        if (len(execution_time_list) == 0 and len(exclude_time_list) == 0):
+            await self.send(channel, 'schedule is required.')
             return
 
-        index = self.exclude_time_list_per_guild[guild.id].index(exclude_time)
-        del self.exclude_time_list_per_guild[guild.id][index]
-        await channel.send('exclude time has successfully removed.')
+        self.execution_time_list_per_guild[guild.id] = execution_time_list
+        self.exclude_time_list_per_guild[guild.id] = exclude_time_list
+        self.build_schedule(guild)
+        self.reset_fire_instants(guild)
+        self.schedule_execution(guild)
+        self.save_state(guild)
+        await self.send(channel, 'imported %s execution and %s exclude times.' % (len(self.execution_time_list_per_guild[guild.id]), len(self.exclude_time_list_per_guild[guild.id])))
+
+    """
+    response execution and exclude lists in import format.
+
+    @param guild discord.Guild
+    @param channel discord.Channel
+    """
+    async def do_export(self, guild, channel):
+        lines = export_expressions(self.execution_time_list_per_guild.get(guild.id) or [], self.exclude_time_list_per_guild.get(guild.id) or [])
+        texts = []
+        text = ''
+
+        for line in lines:
+            if (text != '' and len(text) + len(line) + 8 > self.__class__.message_length_limit):
+                texts.append(text)
+                text = ''
+
+            text += line + '\n'
+
+        if (text != ''):
+            texts.append(text)
+
+        for text in texts:
+            await self.send(channel, '```\n%s```' % (text))
 
     """
     response execution time list.
@@ -436,7 +1239,7 @@ class SleepinessInc(Client):
             for time in self.exclude_time_list_per_guild[guild.id]:
                 text += '\t%s\n' % (time)
         
-        await channel.send(text)
+        await self.send(channel, text)
     
     """
     response status.
@@ -446,10 +1249,130 @@ class SleepinessInc(Client):
     """
     async def do_status(self, guild, channel):
         if (self.sleeping_list_per_guild.get(guild.id) is not None):
-            await channel.send('sleepness inc is sleeping until %s.' % (self.sleeping_list_per_guild[guild.id].isoformat()))
+            await self.send(channel, 'sleepness inc is sleeping until %s.' % (self.sleeping_list_per_guild[guild.id].isoformat()))
             return
         
-        await channel.send('sleepness inc is running.')
+        await self.send(channel, 'sleepness inc is running.')
+
+    """
+    get or set time zone of guild.
+
+    @param zone_name string time zone name or None to get.
+    @param guild discord.Guild
+    @param channel discord.Channel
+    """
+    async def do_timezone(self, zone_name, guild, channel):
+        if (zone_name is None):
+            await self.send(channel, 'time zone is %s.' % (self.get_zone(guild).zone))
+            return
+
+        try:
+            DateTime.get_zone(zone_name)
+        except UnknownTimeZoneError:
+            await self.send(channel, 'unknown time zone %s.' % (zone_name))
+            return
+
+        self.time_zone_per_guild[guild.id] = zone_name
+        self.reset_fire_instants(guild)
+        self.schedule_execution(guild)
+        self.save_state(guild)
+        await self.send(channel, 'time zone has successfully changed to %s.' % (zone_name))
+
+    """
+    exempt or stop exempting role or member from force disconnect.
+
+    @param exempt bool True to exempt, False to stop exempting.
+    @param kind string role or member.
+    @param name string role name, member name or mention.
+    @param guild discord.Guild
+    @param channel discord.Channel
+    """
+    async def do_exempt(self, exempt, kind, name, guild, channel):
+        if (kind == 'role'):
+            target = next((role for role in guild.roles if role.name == name), None)
+
+            if (target is None):
+                await self.send(channel, 'role %s was not found.' % (name))
+                return
+
+            changed = self.exemption_index.add_role(guild, target) if exempt else self.exemption_index.remove_role(guild, target)
+        else:
+            target = parse_member_id(name)
+
+            if (target is None):
+                member = guild.get_member_named(name)
+                target = member.id if member is not None else None
+
+            if (target is None):
+                await self.send(channel, 'member %s was not found.' % (name))
+                return
+
+            changed = self.exemption_index.add_member(guild, target) if exempt else self.exemption_index.remove_member(guild, target)
+
+        if (not changed):
+            await self.send(channel, '%s %s exempted.' % (kind, 'has allready' if exempt else 'was not'))
+            return
+
+        self.save_state(guild)
+        await self.send(channel, '%s has successfully %s.' % (kind, 'exempted' if exempt else 'unexempted'))
+
+    """
+    response exempted roles and members.
+
+    @param guild discord.Guild
+    @param channel discord.Channel
+    """
+    async def do_exempt_list(self, guild, channel):
+        roles = [guild.get_role(role_id) for role_id in self.exemption_index.get_role_ids(guild)]
+        text = ''
+
+        if (len(roles) > 0):
+            text += 'roles:\n'
+
+            for role in roles:
+                text += '\t%s\n' % (role.name if role is not None else 'deleted role')
+
+        member_ids = self.exemption_index.get_member_ids(guild)
+
+        if (len(member_ids) > 0):
+            text += 'members:\n'
+
+            for member_id in member_ids:
+                text += '\t%s\n' % (self.get_member_display_name(guild, member_id))
+
+        await self.send(channel, text if text != '' else 'no exemptions.')
+
+    """
+    response members with most audit events of a month.
+
+    @param kind string disconnect or exclude.
+    @param month string format: [%Y-%m].
+    @param guild discord.Guild
+    @param channel discord.Channel
+    """
+    async def do_stats(self, kind, month, guild, channel):
+        if (kind not in ('disconnect', 'exclude')):
+            await self.send(channel, 'kind must be disconnect or exclude.')
+            return
+
+        try:
+            datetime.strptime(month, '%Y-%m')
+        except ValueError:
+            await self.send(channel, 'month must be %Y-%m format.')
+            return
+
+        top_members = await asyncio.to_thread(self.store.get_top_members, guild.id, month, kind, self.__class__.stats_limit)
+
+        if (len(top_members) == 0):
+            await self.send(channel, 'no %s on %s.' % (kind, month))
+            return
+
+        text = '%s on %s:\n' % ('top night owls' if kind == 'disconnect' else 'top excluded members', month)
+
+        for rank, (member_id, count) in enumerate(top_members, 1):
+            text += '\t%s. %s %s times\n' % (rank, self.get_member_display_name(guild, member_id), count)
+
+        await self.send(channel, text)
 
     """
     sleep.
@@ -460,21 +1383,26 @@ class SleepinessInc(Client):
     """
     async def do_sleep(self, minutes, guild, channel):
         if (minutes < 1):
-            await channel.send('minutes must be greater than or equal 1.')
+            await self.send(channel, 'minutes must be greater than or equal 1.')
             return
 
         if (self.sleeping_list_per_guild.get(guild.id) is not None):
             del self.sleeping_list_per_guild[guild.id]
+            self.get_scheduler(guild).unschedule(('awake', guild.id))
+            self.save_state(guild)
 
         if (minutes > 120):
-            await channel.send('minutes must be less than 120.')
+            await self.send(channel, 'minutes must be less than 120.')
             return
 
         awake_time = DateTime.now().replace(microsecond=0) + timedelta(minutes=minutes)
         text = 'start sleeping %s minutes. until %s.' % (minutes, awake_time.isoformat())
-        await channel.send(text)
-        await self.change_presence(status=Status.idle) # fix me.
+        await self.send(channel, text)
+        await self.set_presence(Status.idle) # fix me.
         self.sleeping_list_per_guild[guild.id] = awake_time
+        self.get_scheduler(guild).schedule(('awake', guild.id), int(awake_time.timestamp()))
+        self.save_state(guild)
+        self.cancel_grace_periods(guild)
 
     """
     awake from sleep.
@@ -486,10 +1414,12 @@ class SleepinessInc(Client):
         if (self.sleeping_list_per_guild.get(guild.id) is None):
             return
 
-        await channel.send('good morning everyone!')
+        await self.send(channel, 'good morning everyone!')
         del self.sleeping_list_per_guild[guild.id]
+        self.get_scheduler(guild).unschedule(('awake', guild.id))
+        self.save_state(guild)
         
-        await self.change_presence(status=Status.online) # fix me.
+        await self.set_presence(Status.online) # fix me.
 
     """
     help.
@@ -502,19 +1432,28 @@ class SleepinessInc(Client):
         usage: @sleepness-inc <command> [<args>]
         ---
         run                     do good night.
-        add <HH:MM>             add time to execution time list. e.g. "00:45".
-        remove <HH:MM>          remove time from execution time list. e.g. "01:00".
-        exclude <%A> <%H:%M>    add time to exclude time list. e.g. "Sunday 01:00".
-        include <%A> <%H:%M>    remove time from exclude time list. e.g. "Monday 02:00".
+        add <schedule>          add time to execution time list. e.g. "00:45", "*/30 00-04 Mon-Fri".
+        remove <schedule>       remove time from execution time list. e.g. "01:00".
+        exclude <schedule>      add time to exclude time list. e.g. "Sunday 01:00", "Sat,Sun".
+        include <schedule>      remove time from exclude time list. e.g. "Monday 02:00".
         list                    list execution time list & exclude time list.
+        export                  export execution & exclude time lists.
+        import <lines>          replace lists with exported lines. e.g. "execute 00 01-03".
         sleep <minute>          sleep execution for minute.
         awake                   wake up from sleep mode.
         status                  get running status.
+        timezone [<zone>]       get or set time zone of execution times. e.g. "Asia/Tokyo".
+        exempt [<kind> <name>]  exempt role or member from force disconnect, list without args. e.g. "role on-call".
+        unexempt <kind> <name>  stop exempting role or member. e.g. "member toro".
+        stats [kind] [%Y-%m]    top disconnected or excluded members of month. e.g. "disconnect 2023-01".
         help                    list available commands and some.
+        ---
+        schedule: <HH:MM> | <%A> <HH:MM> | <weekdays> | <minutes> <hours> [<weekdays>]
+        fields accept "*", ranges, lists and steps. e.g. "*/30 00-04 Mon-Fri".
         ```
         """).strip()
 
-        await channel.send(text)
+        await self.send(channel, text)
 
     """
     check awake.
@@ -523,6 +1462,8 @@ class SleepinessInc(Client):
     @param now datetime.datetime
     """
     async def check_awake(self, guilds, now):
+        jobs = []
+
         for guild in guilds:
             if (self.sleeping_list_per_guild.get(guild.id) is None):
                 continue
@@ -530,7 +1471,9 @@ class SleepinessInc(Client):
             if (self.sleeping_list_per_guild[guild.id] > now):
                 continue
 
-            await self.do_awake(guild, self.find_channel(guild, self.notify_channel_name))
+            jobs.append(self.do_awake(guild, self.find_channel(guild, self.notify_channel_name)))
+
+        await self.fanout.run(jobs, 'awake')
 
     """
     return is executable.
@@ -544,13 +1487,10 @@ class SleepinessInc(Client):
             self.logger.info('sleeping guild: %s.' % (guild.name))
             return False
 
-        if (self.execution_time_list_per_guild.get(guild.id) is None):
+        if (self.execution_schedule_per_guild.get(guild.id) is None):
             return False
 
-        if (now.strftime('%H:%M') in self.execution_time_list_per_guild[guild.id]):
-            return True
-
-        return False
+        return self.execution_schedule_per_guild[guild.id].contains(minute_of_week(now))
 
     """
     return is excludable.
@@ -560,9 +1500,81 @@ class SleepinessInc(Client):
     @return boolean
     """
     async def is_excludable(self, guild, now):
-        if (now.strftime('%A %H:%M') in self.exclude_time_list_per_guild[guild.id]):
-            return True
-        
-        return False
+        if (self.exclude_schedule_per_guild.get(guild.id) is None):
+            return False
+
+        return self.exclude_schedule_per_guild[guild.id].contains(minute_of_week(now))
+
+"""
+SleepinessInc running shards of SHARD_IDS out of SHARD_COUNT in one process.
+each shard has its own scheduler, so one process can own any range of shards.
+"""
+class ShardedSleepinessInc(SleepinessInc, AutoShardedClient):
 
-client = SleepinessInc(os.environ.get('TOKEN', None))
+    """
+    total number of shards, None to use the count recommended by discord.
+    """
+    configured_shard_count = int(os.environ['SHARD_COUNT']) if os.environ.get('SHARD_COUNT') else None
+
+    """
+    shard ids run by this process, None to run all shards.
+    format: [0,1,2] or [0-2].
+    """
+    configured_shard_ids = os.environ.get('SHARD_IDS') or None
+
+    """
+    return discord.AutoShardedClient options of runtime profile.
+
+    @param profile string (required)runtime profile(full, minimal).
+    @return dict
+    """
+    @classmethod
+    def get_client_options(cls, profile):
+        options = super().get_client_options(profile)
+        options['shard_count'] = cls.configured_shard_count
+
+        if (cls.configured_shard_ids is not None):
+            if (cls.configured_shard_count is None):
+                raise Exception('SHARD_COUNT is required with SHARD_IDS.')
+
+            options['shard_ids'] = parse_shard_ids(cls.configured_shard_ids)
+
+        return options
+
+"""
+parse member id from mention.
+
+@param text string format: [<@id>] or [<@!id>].
+@return int or None if not mention.
+"""
+def parse_member_id(text):
+    if (not text.startswith('<@') or not text.endswith('>')):
+        return None
+
+    member_id = text[2:-1].lstrip('!')
+
+    return int(member_id) if member_id.isdigit() else None
+
+"""
+parse shard ids.
+
+@param text string format: [0,1,2] or [0-2] or both.
+@return list[int]
+"""
+def parse_shard_ids(text):
+    shard_ids = []
+
+    for part in text.split(','):
+        if ('-' in part):
+            first, last = part.split('-', 1)
+            shard_ids.extend(range(int(first), int(last) + 1))
+        else:
+            shard_ids.append(int(part))
+
+    return sorted(set(shard_ids))
+
+if __name__ == '__main__':
+    if (os.environ.get('SHARD_COUNT') or os.environ.get('SHARD_IDS')):
+        client = ShardedSleepinessInc(os.environ.get('TOKEN', None))
+    else:
+        client = SleepinessInc(os.environ.get('TOKEN', None))
@@ -0,0 +1,290 @@
+import json
+import sqlite3
+import threading
+
+"""
+persistent per guild state store and audit log on sqlite.
+
+writes are buffered in memory and flushed in batch by a background thread,
+so callers on the event loop never wait for disk. a batch failed to write is
+buffered again and retried with the next flush.
+
+the audit log is append only, counters per guild, month, kind and member are
+aggregated in the same transaction, so stats are read without scanning the log.
+"""
+class Store():
+
+    """
+    seconds between flushes of buffered writes.
+    """
+    flush_interval_seconds = 1.0
+
+    """
+    seconds to wait for a lock held by another connection, e.g. another shard process.
+    """
+    busy_timeout_seconds = 30.0
+
+    """
+    constructor.
+
+    @param path string (required)sqlite database file path.
+    @param logger Logger (required)utils.Logger instance.
+    """
+    def __init__(self, path, logger):
+        self.path = path
+        self.logger = logger
+        self.pending = {}
+        self.pending_events = []
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.closed = False
+
+        connection = self.connect()
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS guild_state ('
+            ' guild_id INTEGER NOT NULL,'
+            ' kind TEXT NOT NULL,'
+            ' value TEXT NOT NULL,'
+            ' PRIMARY KEY (guild_id, kind)'
+            ')'
+        )
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS audit_log ('
+            ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' guild_id INTEGER NOT NULL,'
+            ' member_id INTEGER NOT NULL,'
+            ' channel_id INTEGER NOT NULL,'
+            ' kind TEXT NOT NULL,'
+            ' day TEXT NOT NULL,'
+            ' created_at INTEGER NOT NULL'
+            ')'
+        )
+        connection.execute('CREATE INDEX IF NOT EXISTS audit_log_guild_day ON audit_log (guild_id, day)')
+        connection.execute('CREATE INDEX IF NOT EXISTS audit_log_guild_member ON audit_log (guild_id, member_id, day)')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS audit_count ('
+            ' guild_id INTEGER NOT NULL,'
+            ' month TEXT NOT NULL,'
+            ' kind TEXT NOT NULL,'
+            ' member_id INTEGER NOT NULL,'
+            ' count INTEGER NOT NULL,'
+            ' PRIMARY KEY (guild_id, month, kind, member_id)'
+            ')'
+        )
+        connection.commit()
+        connection.close()
+
+        self.writer = threading.Thread(target=self.write_loop, name='store-writer', daemon=True)
+        self.writer.start()
+
+    """
+    open connection.
+
+    @return sqlite3.Connection
+    """
+    def connect(self):
+        connection = sqlite3.connect(self.path, timeout=self.__class__.busy_timeout_seconds)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+
+        return connection
+
+    """
+    load all guild state in one read.
+
+    @return dict{int: dict{string: any}} state per guild id.
+    """
+    def load_all(self):
+        state = {}
+
+        connection = self.connect()
+        try:
+            for guild_id, kind, value in connection.execute('SELECT guild_id, kind, value FROM guild_state'):
+                state.setdefault(guild_id, {})[kind] = json.loads(value)
+        finally:
+            connection.close()
+
+        return state
+
+    """
+    buffer write of guild state, later write of same key wins.
+
+    @param guild_id int
+    @param kind string state kind.
+    @param value any json serializable value, None to delete.
+    """
+    def put(self, guild_id, kind, value):
+        with self.lock:
+            self.pending[(guild_id, kind)] = value
+
+        self.wakeup.set()
+
+    """
+    buffer append of audit event.
+
+    @param guild_id int
+    @param member_id int
+    @param channel_id int
+    @param kind string event kind, e.g. disconnect, exclude.
+    @param day string local date of guild, format: [%Y-%m-%d].
+    @param created_at int unix time seconds.
+    """
+    def append(self, guild_id, member_id, channel_id, kind, day, created_at):
+        with self.lock:
+            self.pending_events.append((guild_id, member_id, channel_id, kind, day, created_at))
+
+        self.wakeup.set()
+
+    """
+    return members with most audit events of a month, buffered events included.
+
+    runs a blocking read, call from a thread.
+
+    @param guild_id int
+    @param month string format: [%Y-%m].
+    @param kind string event kind.
+    @param limit int
+    @return list[tuple(int member id, int count)]
+    """
+    def get_top_members(self, guild_id, month, kind, limit):
+        counts = {}
+
+        # no batch is written between reading counts and buffer, so each event is counted once.
+        with self.write_lock:
+            connection = self.connect()
+            try:
+                for member_id, count in connection.execute('SELECT member_id, count FROM audit_count WHERE guild_id = ? AND month = ? AND kind = ?', (guild_id, month, kind)):
+                    counts[member_id] = count
+            finally:
+                connection.close()
+
+            with self.lock:
+                for event in self.pending_events:
+                    if (event[0] == guild_id and event[3] == kind and event[4][:7] == month):
+                        counts[event[1]] = counts.get(event[1], 0) + 1
+
+        return sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+    """
+    write buffered state and audit events to database.
+
+    readers of audit counts wait while a batch is taken out of buffer and written.
+
+    @param connection sqlite3.Connection
+    """
+    def flush(self, connection):
+        with self.write_lock:
+            self.flush_batch(connection)
+
+    """
+    take buffered writes and write them in one transaction.
+
+    @param connection sqlite3.Connection
+    """
+    def flush_batch(self, connection):
+        with self.lock:
+            pending = self.pending
+            self.pending = {}
+            events = self.pending_events
+            self.pending_events = []
+
+        if (len(pending) == 0 and len(events) == 0):
+            return
+
+        counts = {}
+        for guild_id, member_id, channel_id, kind, day, created_at in events:
+            key = (guild_id, day[:7], kind, member_id)
+            counts[key] = counts.get(key, 0) + 1
+
+        upserts = []
+        deletes = []
+
+        for (guild_id, kind), value in pending.items():
+            if (value is None):
+                deletes.append((guild_id, kind))
+            else:
+                upserts.append((guild_id, kind, json.dumps(value)))
+
+        try:
+            self.write(connection, upserts, deletes, events, counts)
+        except Exception:
+            self.restore(pending, events)
+            raise
+
+        self.logger.debug('store flushed %s rows and %s audit events.' % (len(pending), len(events)))
+
+    """
+    write a batch in one transaction.
+
+    @param connection sqlite3.Connection
+    @param upserts list[tuple(int, string, string)] guild state rows to write.
+    @param deletes list[tuple(int, string)] guild state keys to delete.
+    @param events list[tuple] audit events.
+    @param counts dict{tuple(int, string, string, int): int} audit counts to add.
+    """
+    def write(self, connection, upserts, deletes, events, counts):
+        with connection:
+            connection.executemany('INSERT OR REPLACE INTO guild_state (guild_id, kind, value) VALUES (?, ?, ?)', upserts)
+            connection.executemany('DELETE FROM guild_state WHERE guild_id = ? AND kind = ?', deletes)
+            connection.executemany('INSERT INTO audit_log (guild_id, member_id, channel_id, kind, day, created_at) VALUES (?, ?, ?, ?, ?, ?)', events)
+            connection.executemany(
+                'INSERT INTO audit_count (guild_id, month, kind, member_id, count) VALUES (?, ?, ?, ?, ?)'
+                ' ON CONFLICT (guild_id, month, kind, member_id) DO UPDATE SET count = count + excluded.count',
+                [key + (count,) for key, count in counts.items()]
+            )
+
+    """
+    buffer a batch failed to write again, values buffered meanwhile are newer and kept.
+
+    @param pending dict{tuple(int, string): any} guild state of batch.
+    @param events list[tuple] audit events of batch.
+    """
+    def restore(self, pending, events):
+        with self.lock:
+            for key, value in pending.items():
+                self.pending.setdefault(key, value)
+
+            self.pending_events = events + self.pending_events
+
+    """
+    background writer loop.
+    """
+    def write_loop(self):
+        connection = self.connect()
+
+        try:
+            while (not self.closed):
+                self.wakeup.wait()
+
+                # coalesce writes arriving during the interval into one transaction.
+                self.stopping.wait(self.__class__.flush_interval_seconds)
+                self.wakeup.clear()
+
+                try:
+                    self.flush(connection)
+                except Exception as e:
+                    self.logger.error('store flush failed, retrying: %s' % (repr(e)))
+                    self.wakeup.set()
+
+            try:
+                self.flush(connection)
+            except Exception as e:
+                self.logger.error('store flush failed on close: %s' % (repr(e)))
+        finally:
+            connection.close()
+
+    """
+    flush buffered writes and stop writer.
+
+    blocks until the last flush is written, call from a thread.
+    """
+    def close(self):
+        if (self.closed):
+            return
+
+        self.closed = True
+        self.stopping.set()
+        self.wakeup.set()
+        self.writer.join()
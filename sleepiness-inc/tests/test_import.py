@@ -0,0 +1,23 @@
+import importlib.util
+import os
+import sys
+import unittest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+sys.path.insert(0, ROOT)
+
+"""
+bot module loads with the names it imports from its sibling modules.
+"""
+class ImportTest(unittest.TestCase):
+
+    def test_bot_module_loads(self):
+        spec = importlib.util.spec_from_file_location('sleepiness_inc', os.path.join(ROOT, 'sleepiness-inc.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+
+        self.assertTrue(hasattr(module, 'SleepinessInc'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+import unittest
+
+from unittest import mock
+
+from discord import HTTPException
+from multidict import CIMultiDict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from utils import Logger, RestScheduler
+
+"""
+response of a request rate limited by discord.
+"""
+class FakeResponse():
+    def __init__(self, headers):
+        self.status = 429
+        self.reason = 'Too Many Requests'
+        self.headers = CIMultiDict(headers)
+
+"""
+retry of requests rate limited by server.
+"""
+class RestSchedulerRetryTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.scheduler = RestScheduler(1, Logger('NONE'))
+        backoff = mock.patch.object(RestScheduler, 'backoff_seconds', 10.0)
+        backoff.start()
+        self.addCleanup(backoff.stop)
+        self.delays = []
+        put_later = self.scheduler.put_later
+
+        def record(delay, item):
+            self.delays.append(delay)
+            put_later(delay, item)
+
+        self.scheduler.put_later = record
+
+    async def asyncTearDown(self):
+        self.scheduler.stop()
+
+    """
+    return factory raising 429 with headers once, then returning 'sent'.
+    """
+    def get_factory(self, headers):
+        attempts = []
+
+        async def factory():
+            attempts.append(time.monotonic())
+
+            if (len(attempts) == 1):
+                raise HTTPException(FakeResponse(headers), {'message': 'You are being rate limited.', 'retry_after': 250, 'global': False})
+
+            return 'sent'
+
+        return factory, attempts
+
+    async def test_retry_after_header_is_used(self):
+        factory, attempts = self.get_factory({'Retry-After': '0.25'})
+
+        self.assertEqual(await self.scheduler.submit(0, 'channel.send:1', factory), 'sent')
+        self.assertEqual(self.delays, [0.25])
+        self.assertGreaterEqual(attempts[1] - attempts[0], 0.25)
+        self.assertLess(attempts[1] - attempts[0], 1.0)
+        self.assertEqual(self.scheduler.metrics['rate_limited'], 1)
+
+    async def test_reset_after_header_is_used(self):
+        factory, attempts = self.get_factory({'X-RateLimit-Reset-After': '0.1'})
+
+        self.assertEqual(await self.scheduler.submit(0, 'channel.send:1', factory), 'sent')
+        self.assertEqual(self.delays, [0.1])
+
+    async def test_backoff_without_header(self):
+        RestScheduler.backoff_seconds = 0.05
+        factory, attempts = self.get_factory({})
+
+        self.assertEqual(await self.scheduler.submit(0, 'channel.send:1', factory), 'sent')
+        self.assertEqual(self.delays, [0.05])
+
+if __name__ == '__main__':
+    unittest.main()
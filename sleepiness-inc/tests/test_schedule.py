@@ -0,0 +1,124 @@
+import os
+import sys
+import unittest
+
+from datetime import datetime, timedelta
+
+import pytz
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from schedule import DAY_MASK, FireInstants, compile_expression, compile_expressions, get_day_instants, get_fire_instants, get_localized_instants
+
+"""
+walk FireInstants.next across several horizons and compare with instants computed at once.
+
+usage: python -m unittest discover -s sleepiness-inc/tests
+"""
+class FireInstantsTest(unittest.TestCase):
+
+    """
+    schedules walked, the default one, a weekly one and ones on local times changed by DST.
+    """
+    expressions = [
+        ['*/30 00-03', '00 04-06'],
+        ['0 0 Mon'],
+        ['30 02'],
+        ['30 01 Sun'],
+    ]
+
+    """
+    ranges walked, each over 5 weeks including a DST transition.
+    """
+    ranges = [
+        ('America/New_York', datetime(2024, 2, 20), datetime(2024, 3, 26)),
+        ('America/New_York', datetime(2024, 10, 20), datetime(2024, 11, 24)),
+        ('Europe/Berlin', datetime(2024, 3, 10), datetime(2024, 4, 14)),
+        ('Europe/Berlin', datetime(2024, 10, 13), datetime(2024, 11, 17)),
+        ('Asia/Tokyo', datetime(2024, 1, 1), datetime(2024, 2, 5)),
+    ]
+
+    def test_next_walks_across_horizons(self):
+        for zone_name, first, last in self.ranges:
+            zone = pytz.timezone(zone_name)
+            start = int(zone.localize(first).timestamp())
+            end = int(zone.localize(last).timestamp())
+
+            for expressions in self.expressions:
+                with self.subTest(zone=zone_name, start=first, expressions=expressions):
+                    schedule = compile_expressions(expressions)[0]
+                    expected = get_fire_instants(schedule, zone, start, end)
+                    fire_instants = FireInstants(schedule, zone)
+                    walked = []
+                    instant = fire_instants.next(start)
+
+                    while (instant is not None and instant <= end):
+                        walked.append(instant)
+                        instant = fire_instants.next(instant)
+
+                    self.assertGreater(len(expected), 0)
+                    self.assertEqual(walked, expected)
+                    self.assertIsNotNone(instant)
+
+    def test_next_of_empty_schedule(self):
+        schedule = compile_expressions([])[0]
+
+        self.assertIsNone(FireInstants(schedule, pytz.utc).next(0))
+
+"""
+instants of a day shifted by utc offsets against localizing every minute.
+"""
+class DayInstantsTest(unittest.TestCase):
+
+    """
+    zones with DST transitions at night, at midnight and of 30 minutes.
+    """
+    zone_names = ['America/New_York', 'Europe/Berlin', 'America/Santiago', 'Asia/Beirut', 'Australia/Lord_Howe', 'Asia/Tokyo']
+
+    def test_transition_days(self):
+        for zone_name in self.zone_names:
+            zone = pytz.timezone(zone_name)
+            day = datetime(2024, 1, 1)
+
+            while (day < datetime(2025, 1, 1)):
+                noon = zone.localize(day + timedelta(hours=12)).utcoffset()
+
+                # the days around a change of offset.
+                if (noon != zone.localize(day + timedelta(hours=36)).utcoffset() or noon != zone.localize(day - timedelta(hours=12)).utcoffset()):
+                    with self.subTest(zone=zone_name, day=day):
+                        self.assertEqual(sorted(get_day_instants(zone, day, DAY_MASK)), sorted(get_localized_instants(zone, day, DAY_MASK)))
+
+                day += timedelta(days=1)
+
+"""
+normalized forms of schedule expressions.
+"""
+class CompileExpressionTest(unittest.TestCase):
+
+    def test_same_time_is_normalized_the_same(self):
+        for expression in ('0 0', '00 00', '00:00', '0:0'):
+            with self.subTest(expression=expression):
+                self.assertEqual(compile_expression(expression), compile_expression('00:00'))
+
+    def test_weekday_tokens_are_accepted_in_every_form(self):
+        for expression in ('0 2 Mon', 'Mon 02:00', 'Monday 02:00', '0 2 monday'):
+            with self.subTest(expression=expression):
+                self.assertEqual(compile_expression(expression), compile_expression('Monday 02:00'))
+
+    def test_normalized_forms(self):
+        cases = [
+            ('0 0 mon', 'Monday 00:00'),
+            ('Mon 02:00', 'Monday 02:00'),
+            ('mon 2:00', 'Monday 02:00'),
+            ('*/30 0-3', '*/30 00-03'),
+            ('*/05 1 mon-FRI', '*/5 01 Mon-Fri'),
+            ('sat,sunday', 'Sat,Sun'),
+        ]
+
+        for expression, normalized in cases:
+            with self.subTest(expression=expression):
+                self.assertEqual(compile_expression(expression)[0], normalized)
+                self.assertEqual(compile_expression(normalized)[1], compile_expression(expression)[1])
+
+if __name__ == '__main__':
+    unittest.main()